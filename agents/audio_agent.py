@@ -1,39 +1,131 @@
 import sounddevice as sd
-from scipy.io.wavfile import write
 import numpy as np
+import threading
+import time
 import os
+import sys
 
-def record_audio(filename="audio/raw.wav", fs=16000):
-    print("🎤 Recording... Press Ctrl+C to stop (Max 30 mins)")
-    
-    recorded_chunks = []
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.wav_writer import IncrementalWavWriter
+
+
+class RingBuffer:
+    """
+    Preallocated single-producer / single-consumer ring buffer of audio frames.
+    The audio callback writes into it and a writer thread drains it, so memory stays
+    constant regardless of how long the recording runs.
+    """
+
+    def __init__(self, capacity, channels=1, dtype=np.int16):
+        self._buffer = np.zeros((capacity, channels), dtype=dtype)
+        self.capacity = capacity
+        self._read_pos = 0
+        self._write_pos = 0
+        self._lock = threading.Lock()
+        self.dropped_frames = 0
+
+    def write(self, data):
+        """Copy frames in; frames that do not fit are dropped and counted."""
+        with self._lock:
+            free = self.capacity - (self._write_pos - self._read_pos)
+        n = len(data)
+        if n > free:
+            self.dropped_frames += n - free
+            n = free
+        if n == 0:
+            return
+
+        start = self._write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        self._buffer[:n - first] = data[first:n]
+
+        with self._lock:
+            self._write_pos += n
+
+    def read(self):
+        """Return (a copy of) every frame currently buffered."""
+        with self._lock:
+            available = self._write_pos - self._read_pos
+        if available == 0:
+            return self._buffer[:0].copy()
+
+        start = self._read_pos % self.capacity
+        first = min(available, self.capacity - start)
+        out = np.concatenate((self._buffer[start:start + first], self._buffer[:available - first]))
+
+        with self._lock:
+            self._read_pos += available
+        return out
+
+
+def record_audio(filename="audio/raw.wav", fs=16000, max_duration=None, buffer_seconds=10, on_audio=None):
+    """
+    Record from the default microphone straight to disk.
+
+    Frames flow from the input callback through a fixed-size ring buffer into an
+    incrementally written WAV, so memory use is constant and the file on disk is valid
+    at every moment (a crash loses at most the last fraction of a second).
+
+    Args:
+        filename (str): Path of the WAV file to write.
+        fs (int): Sample rate in Hz.
+        max_duration (float): Optional limit in seconds. Records until Ctrl+C if None.
+        buffer_seconds (float): Capacity of the ring buffer.
+        on_audio (callable): Optional hook called from the writer thread with every
+            block of int16 frames after it is written (e.g. for live transcription).
+
+    Returns:
+        str: Path to the recorded file, or None if nothing was captured.
+    """
+    print("🎤 Recording... Press Ctrl+C to stop")
+
+    ring = RingBuffer(int(buffer_seconds * fs))
+    writer = IncrementalWavWriter(filename, fs)
+    stop_event = threading.Event()
 
     def callback(indata, frames, time, status):
         if status:
             print(status)
-        recorded_chunks.append(indata.copy())
+        ring.write(indata)
 
+    def flush():
+        block = ring.read()
+        writer.write(block)
+        if on_audio is not None and len(block):
+            on_audio(block)
+
+    def drain():
+        while not stop_event.wait(0.2):
+            flush()
+        # Flush whatever arrived after the stream closed
+        flush()
+
+    writer_thread = threading.Thread(target=drain, name="wav-writer", daemon=True)
+    writer_thread.start()
+
+    started = time.monotonic()
     try:
-        # Record for up to 30 minutes (1800 seconds)
-        with sd.InputStream(samplerate=fs, channels=1, callback=callback):
-            for _ in range(30 * 60 * 10): # Check every 0.1s
+        with sd.InputStream(samplerate=fs, channels=1, dtype="int16", callback=callback):
+            while max_duration is None or time.monotonic() - started < max_duration:
                 sd.sleep(100)
     except KeyboardInterrupt:
         print("\n✅ Recording stopped manually.")
-    
-    if not recorded_chunks:
-        return
+    finally:
+        stop_event.set()
+        writer_thread.join()
+        writer.close()
 
-    # Concatenate all chunks
-    audio = np.concatenate(recorded_chunks, axis=0)
-    
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if ring.dropped_frames:
+        print(f"⚠️ Dropped {ring.dropped_frames} frames (disk writes fell behind)")
 
-    # Save file
-    write(filename, fs, audio)
-    print(f"✅ Saved to {filename}")
+    if writer.frames_written == 0:
+        return None
+
+    print(f"✅ Saved {writer.duration:.1f}s to {filename}")
+    return filename
 
 if __name__ == "__main__":
     record_audio()
-
@@ -1,42 +1,373 @@
 import os
+import sys
+import json
+import time
 import numpy as np
-import librosa
-import noisereduce as nr
-from scipy.io.wavfile import write
+from math import gcd
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from scipy.io import wavfile
+from scipy.signal import resample_poly, fftconvolve, istft
 
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def clean_audio(input_file="audio/raw.wav", output_file="audio/cleaned.wav"):
+from agents.wav_writer import IncrementalWavWriter
+from agents.noise_profiles import (
+    NoiseProfileStore,
+    N_FFT,
+    HOP_LENGTH,
+    amp_to_db,
+    stft_frames,
+    noise_threshold,
+)
+from config.settings import SNR_SKIP_DB, SNR_LIGHT_DB
+
+TARGET_SR = 16000
+
+
+def _open_wav(input_file):
     """
-    Load an audio file, reduce noise, and save the cleaned audio.
+    Memory-map a WAV file so blocks can be read without loading the whole recording.
+    Other formats (mp3, m4a, ogg, ...) are decoded into memory at TARGET_SR instead.
+
+    Returns:
+        tuple: (sample rate, samples)
+    """
+    with open(input_file, "rb") as f:
+        is_wav = f.read(4) in (b"RIFF", b"RIFX")
+    if is_wav:
+        try:
+            return wavfile.read(input_file, mmap=True)
+        except ValueError:
+            pass
+        try:
+            # Formats scipy cannot map (e.g. 24-bit PCM) are read normally
+            return wavfile.read(input_file)
+        except ValueError:
+            pass  # compressed WAV variants go through the decoder
+    stat = os.stat(input_file)
+    return _decode(os.path.abspath(input_file), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=1)
+def _decode(path, mtime_ns, size):
+    """Decode a non-WAV file once per process; the key changes if the file does."""
+    import librosa  # slow to import and only needed for non-WAV input
+
+    audio, sr = librosa.load(path, sr=TARGET_SR, mono=True)
+    return sr, audio
+
+
+def _to_mono_float(block):
+    """Convert a block of WAV samples of any supported dtype to mono float32 in [-1, 1]."""
+    block = np.asarray(block)
+    if block.dtype == np.uint8:
+        block = (block.astype(np.float32) - 128) / 128
+    elif np.issubdtype(block.dtype, np.integer):
+        block = block.astype(np.float32) / -np.iinfo(block.dtype).min
+    else:
+        block = block.astype(np.float32)
+    if block.ndim > 1:
+        block = block.mean(axis=1)
+    return block
+
+
+def _resample(audio, orig_sr, target_sr):
+    if orig_sr == target_sr:
+        return audio
+    g = gcd(orig_sr, target_sr)
+    return resample_poly(audio, target_sr // g, orig_sr // g).astype(np.float32)
+
+
+def estimate_noise_clip(audio, sr, frame_seconds=0.05, quantile=0.1):
+    """
+    Build a noise sample from the quietest frames of `audio`.
+
+    Returns:
+        np.ndarray: Concatenation of the lowest-energy `quantile` of frames.
+    """
+    frame_len = max(1, int(sr * frame_seconds))
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return audio
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    energy = np.mean(frames * frames, axis=1)
+    keep = max(1, int(n_frames * quantile))
+    quietest = np.sort(np.argsort(energy)[:keep])
+    return frames[quietest].reshape(-1)
+
+
+def estimate_snr(audio, sr, frame_seconds=0.05):
+    """
+    Rough signal-to-noise ratio in dB: loud (90th percentile) frame energy over quiet
+    (10th percentile) frame energy.
+    """
+    frame_len = max(1, int(sr * frame_seconds))
+    n_frames = len(audio) // frame_len
+    if n_frames < 2:
+        return 0.0
+    energy = np.mean(audio[:n_frames * frame_len].reshape(n_frames, frame_len) ** 2, axis=1)
+    noise, signal = np.percentile(energy, [10, 90])
+    return float(10 * np.log10((signal + 1e-12) / (noise + 1e-12)))
+
+
+def _sample_audio(data, rate, target_sr, windows=20, window_seconds=3.0):
+    """Gather evenly spaced windows across the recording for a cheap pre-pass."""
+    window = int(window_seconds * rate)
+    if len(data) <= windows * window:
+        return _resample(_to_mono_float(data), rate, target_sr)
+    starts = np.linspace(0, len(data) - window, windows).astype(int)
+    return np.concatenate([_resample(_to_mono_float(data[s:s + window]), rate, target_sr) for s in starts])
+
+
+def choose_reduction(snr_db, skip_db=SNR_SKIP_DB, light_db=SNR_LIGHT_DB):
+    """
+    Map a measured SNR to a cleaning decision.
+
+    Returns:
+        tuple: (decision, prop_decrease) where decision is "skip", "light" or "full".
+    """
+    if snr_db >= skip_db:
+        return "skip", 0.0
+    if snr_db >= light_db:
+        return "light", 0.5
+    return "full", 1.0
+
+
+@lru_cache(maxsize=4)
+def _mask_smoothing_filter(sr, freq_smooth_hz=500, time_smooth_ms=50):
+    """Triangular kernel smoothing the gate mask over ~500 Hz and ~50 ms."""
+    n_freq = max(1, int(freq_smooth_hz / (sr / (N_FFT / 2))))
+    n_time = max(1, int(time_smooth_ms / (HOP_LENGTH / sr * 1000)))
+
+    def ramp(n):
+        return np.concatenate([np.linspace(0, 1, n + 1, endpoint=False), np.linspace(1, 0, n + 2)])[1:-1]
+
+    kernel = np.outer(ramp(n_freq), ramp(n_time))
+    return kernel / kernel.sum()
+
+
+def spectral_gate(audio, sr, threshold, prop_decrease=1.0):
+    """
+    Stationary spectral gating with a precomputed per-frequency noise `threshold` (dB, see
+    noise_profiles.noise_threshold): bins below it are attenuated by `prop_decrease`.
+    The noise statistics are computed once per recording or taken from a stored profile,
+    so each block only pays for its own STFT.
+    """
+    spec = stft_frames(audio)
+    mask = amp_to_db(spec) > threshold[:, None]
+    mask = mask * prop_decrease + (1.0 - prop_decrease)
+    mask = fftconvolve(mask, _mask_smoothing_filter(sr), mode="same")
+    _, gated = istft(spec * mask, nfft=N_FFT, nperseg=N_FFT, noverlap=N_FFT - HOP_LENGTH)
+    out = np.zeros(len(audio), dtype=np.float32)
+    n = min(len(audio), len(gated))
+    out[:n] = gated[:n]
+    return out
+
+
+def _clean_block(source, start, end, context, target_sr, noise_thresh, prop_decrease=1.0):
+    """
+    Denoise one block (plus context on both sides) and return only its central part.
+    `source` is a WAV path to map, or a (rate, samples) pair already in memory.
+    """
+    rate, data = _open_wav(source) if isinstance(source, str) else source
+    lo = max(0, start - context)
+    hi = min(len(data), end + context)
+    audio = _resample(_to_mono_float(data[lo:hi]), rate, target_sr)
+
+    if prop_decrease > 0:
+        reduced = spectral_gate(audio, target_sr, noise_thresh, prop_decrease)
+    else:
+        reduced = audio
+
+    ratio = target_sr / rate
+    head = int(round((start - lo) * ratio))
+    tail = int(round((end - lo) * ratio))
+    return reduced[head:tail].astype(np.float32)
+
+
+def iter_cleaned_blocks(input_file, target_sr=TARGET_SR, block_seconds=30, context_seconds=0.5,
+                        profile_seconds=30, workers=1, noise_profile=None, report=None):
+    """
+    Denoise an audio file block by block and yield the cleaned float32 blocks in order.
+
+    A single noise threshold is estimated from the quietest frames of the first
+    `profile_seconds` (or taken from the stored `noise_profile`) and applied to every
+    block, so reduction is consistent across the recording. Each block is processed with `context_seconds` of neighbouring audio that
+    is discarded afterwards, which avoids artifacts at block edges. Resampling only
+    happens when the file is not already at `target_sr`.
+
+    A quick SNR pre-pass over samples of the recording decides whether denoising runs at
+    full strength, lightly, or not at all (see SNR_SKIP_DB / SNR_LIGHT_DB).
 
     Args:
-        input_file (str): Path to the input WAV file.
-        output_file (str): Path to save the cleaned WAV file.
+        input_file (str): Path to the input audio file (WAV is memory-mapped).
+        target_sr (int): Output sample rate.
+        block_seconds (float): Length of each processed block.
+        context_seconds (float): Overlap on each side of a block.
+        profile_seconds (float): Audio used to estimate the noise profile.
+        workers (int): Number of processes denoising blocks concurrently.
+        noise_profile (str): Name of the room or microphone. Its stored noise profile is
+            reused without looking at this recording's noise, and re-learned from it when
+            missing, expired or drifted (see NoiseProfileStore.resolve).
+        report (dict): Optional dict filled with the measured SNR and cleaning decision.
+    """
+    rate, data = _open_wav(input_file)
+    total = len(data)
+
+    snr_db = estimate_snr(_sample_audio(data, rate, target_sr), target_sr)
+    decision, prop_decrease = choose_reduction(snr_db)
+    print(f"📶 Estimated SNR {snr_db:.1f} dB → denoising: {decision}")
+
+    def estimate():
+        profile_audio = _resample(_to_mono_float(data[:int(profile_seconds * rate)]), rate, target_sr)
+        return estimate_noise_clip(profile_audio, target_sr)
+
+    noise_thresh = None
+    profile_status = None
+    if prop_decrease > 0:
+        if noise_profile:
+            profile, profile_status = NoiseProfileStore().resolve(noise_profile, target_sr, estimate)
+            noise_thresh = profile["threshold"]
+            print(f"🔉 Noise profile '{noise_profile}': {profile_status}")
+        else:
+            noise_thresh = noise_threshold(estimate())
+    # Decoded (non-WAV or unmappable) audio is already in memory, so blocks are handed over
+    # as slices rather than decoded again by every call or worker
+    in_memory = not isinstance(data, np.memmap)
+    if not in_memory:
+        del data
+
+    if report is not None:
+        report.update({
+            "input_file": input_file,
+            "snr_db": round(snr_db, 2),
+            "decision": decision,
+            "prop_decrease": prop_decrease,
+            "noise_profile": noise_profile,
+            "noise_profile_status": profile_status,
+        })
+
+    block = max(1, int(block_seconds * rate))
+    context = int(context_seconds * rate)
+    spans = [(s, min(s + block, total)) for s in range(0, total, block)]
+
+    def block_args(start, end):
+        if not in_memory:
+            return input_file, start, end
+        lo = max(0, start - context)
+        return (rate, data[lo:end + context]), start - lo, end - lo
+
+    if workers <= 1:
+        for start, end in spans:
+            yield _clean_block(*block_args(start, end), context, target_sr, noise_thresh, prop_decrease)
+        return
+
+    # Keep a bounded window of blocks in flight so memory does not grow with file length
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for start, end in spans:
+            pending.append(pool.submit(_clean_block, *block_args(start, end), context, target_sr,
+                                       noise_thresh, prop_decrease))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def _log_cleaning(report, log_file):
+    """Append the SNR measurement and decision for one recording to a JSONL log."""
+    if not log_file:
+        return
+    directory = os.path.dirname(log_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"timestamp": time.time(), **report}) + "\n")
+
+
+def clean_audio_array(input_file="audio/raw.wav", output_file=None, block_seconds=30, workers=1,
+                      noise_profile=None, log_file="audio/cleaning_log.jsonl"):
+    """
+    Reduce noise and return the cleaned audio as a float32 array at 16kHz, ready to be
+    passed straight to Whisper's `transcribe` without a disk round trip.
+
+    Args:
+        input_file (str): Path to the input audio file (WAV is memory-mapped).
+        output_file (str): Optionally also save the cleaned audio to this WAV file.
+        block_seconds (float): Length of each processed block.
+        workers (int): Number of processes used for noise reduction.
+        noise_profile (str): Optional room/microphone name whose cached profile is reused.
+        log_file (str): JSONL file recording the measured SNR and cleaning decision.
 
     Returns:
-        str: Path to the cleaned audio file.
+        np.ndarray: Cleaned mono float32 samples.
     """
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found: {input_file}")
 
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    rate, data = _open_wav(input_file)
+    # Preallocate the output (plus slack for per-block rounding) instead of concatenating
+    cleaned = np.empty(int(np.ceil(len(data) * TARGET_SR / rate)) + 64, dtype=np.float32)
+    del data
+
+    writer = IncrementalWavWriter(output_file, TARGET_SR) if output_file else None
+    report = {}
+    filled = 0
+    try:
+        for block in iter_cleaned_blocks(input_file, block_seconds=block_seconds, workers=workers,
+                                         noise_profile=noise_profile, report=report):
+            if filled + len(block) > len(cleaned):
+                cleaned = np.resize(cleaned, filled + len(block))
+            cleaned[filled:filled + len(block)] = block
+            filled += len(block)
+            if writer is not None:
+                writer.write(block)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    _log_cleaning({**report, "output_file": output_file}, log_file)
+    if writer is not None:
+        print("🧼 Cleaned audio saved:", output_file)
+    return cleaned[:filled]
+
 
-    # Load audio (resample to 16kHz)
-    audio, sr = librosa.load(input_file, sr=16000)
+def clean_audio(input_file="audio/raw.wav", output_file="audio/cleaned.wav", block_seconds=30, workers=1,
+                noise_profile=None, log_file="audio/cleaning_log.jsonl"):
+    """
+    Load an audio file, reduce noise, and save the cleaned audio.
+
+    The file is memory-mapped and cleaned in overlapping blocks that are written to disk
+    as they finish, so peak memory does not depend on the recording length.
 
-    # Perform noise reduction
-    reduced_noise = nr.reduce_noise(y=audio, sr=sr)
+    Args:
+        input_file (str): Path to the input audio file (WAV is memory-mapped).
+        output_file (str): Path to save the cleaned WAV file.
+        block_seconds (float): Length of each processed block.
+        workers (int): Number of processes used for noise reduction.
+        noise_profile (str): Optional room/microphone name whose cached profile is reused.
+        log_file (str): JSONL file recording the measured SNR and cleaning decision.
 
-    # Convert to int16 for PCM WAV compatibility (required by speech_recognition)
-    reduced_noise = (reduced_noise * 32767).astype(np.int16)
+    Returns:
+        str: Path to the cleaned audio file.
+    """
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found: {input_file}")
 
-    # Save cleaned audio
-    write(output_file, sr, reduced_noise)
+    # Output is 16-bit PCM WAV (required by speech_recognition)
+    report = {}
+    with IncrementalWavWriter(output_file, TARGET_SR) as writer:
+        for block in iter_cleaned_blocks(input_file, block_seconds=block_seconds, workers=workers,
+                                         noise_profile=noise_profile, report=report):
+            writer.write(block)
+    _log_cleaning({**report, "output_file": output_file}, log_file)
 
     print("🧼 Cleaned audio saved:", output_file)
     return output_file
 
 
 if __name__ == "__main__":
-    clean_audio()
+    # Optional room/microphone name, e.g. `python agents/audio_cleaning_agent.py room-3`
+    clean_audio(workers=os.cpu_count() or 1, noise_profile=sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,5 +1,15 @@
 # care_suggestions.py
 import json
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.keyword_automaton import KeywordAutomaton
 
 # =============================================================================
 # KNOWLEDGE BASE (Care Suggestions)
@@ -190,6 +200,67 @@ SYMPTOM_CARE = {
     
 }
 
+# Other ways conditions are named in transcripts and extracted data -> knowledge-base key
+CONDITION_SYNONYMS = {
+    "high blood pressure": "hypertension",
+    "high bp": "hypertension",
+    "htn": "hypertension",
+    "diabetes mellitus": "diabetes",
+    "type 2 diabetes": "diabetes",
+    "sugar problem": "diabetes",
+    "uti": "urinary tract infection",
+    "urine infection": "urinary tract infection",
+    "anaemia": "anemia",
+    "acidity": "gastritis",
+    "hay fever": "allergic rhinitis",
+    "nasal allergy": "allergic rhinitis",
+    "migraines": "migraine",
+    "headaches": "headache",
+    "throat pain": "sore throat",
+    "chest pain": "chest discomfort",
+    "breathlessness": "shortness of breath",
+    "difficulty breathing": "shortness of breath",
+    "tiredness": "fatigue",
+    "weakness": "fatigue",
+    "giddiness": "dizziness",
+    "vertigo": "dizziness",
+    "loose motions": "diarrhea",
+    "loose stools": "diarrhea",
+    "diarrhoea": "diarrhea",
+    "throwing up": "vomiting",
+    "insomnia": "sleep disturbance",
+    "trouble sleeping": "sleep disturbance",
+    "menstrual cramps": "period pain",
+    "period cramps": "period pain",
+    "dysmenorrhea": "period pain",
+    "cramps": "muscle cramps",
+    # Matching is on whole words, so inflected forms are listed explicitly
+    "fevers": "fever",
+    "feverish": "fever",
+    "coughs": "cough",
+    "coughing": "cough",
+    "painful": "pain",
+    "pains": "pain",
+    "aches": "pain",
+    "ache": "pain",
+    "aching": "pain",
+    "nauseous": "nausea",
+    "nauseated": "nausea",
+    "dizzy": "dizziness",
+    "vomit": "vomiting",
+    "vomits": "vomiting",
+    "vomited": "vomiting",
+    "tired": "fatigue",
+    "constipated": "constipation",
+    "colds": "common cold",
+    "diabetic": "diabetes",
+    "hypertensive": "hypertension",
+    "asthmatic": "asthma",
+    "anaemic": "anemia",
+    "anemic": "anemia",
+    "arthritic": "arthritis",
+}
+
 GENERIC_CARE = [
     "Ensure you are getting adequate sleep and rest.",
     "Maintain good hydration by drinking plenty of water.",
@@ -202,54 +273,256 @@ DISCLAIMER = """Disclaimer:
 These are general care suggestions and do not replace medical advice.
 Always follow your doctor’s instructions."""
 
+class CareIndex:
+    """
+    Keyword automaton over every knowledge-base key and synonym. All conditions in a
+    text are found in one whole-word pass, whatever the size of the knowledge base.
+    """
+
+    def __init__(self, disease_care=DISEASE_CARE, symptom_care=SYMPTOM_CARE, synonyms=CONDITION_SYNONYMS):
+        self.disease_care = disease_care
+        self.symptom_care = symptom_care
+        self.automaton = KeywordAutomaton()
+        for key in symptom_care:
+            self.automaton.add(key, ("symptom", key))
+        for key in disease_care:
+            self.automaton.add(key, ("disease", key))
+        for synonym, key in synonyms.items():
+            if key in disease_care:
+                self.automaton.add(synonym, ("disease", key))
+            elif key in symptom_care:
+                self.automaton.add(synonym, ("symptom", key))
+
+    def find(self, text):
+        """
+        Knowledge-base conditions mentioned in `text`, in order of first mention.
+
+        Returns:
+            list: (kind, key) tuples, kind being "disease" or "symptom".
+        """
+        return list(dict.fromkeys(value for _, _, _, value in self.automaton.find_all(text)))
+
+    def suggest(self, diseases=None, symptoms=None, consultation_summary=None):
+        """
+        Care suggestions for every condition found, diseases first. A tip shared by
+        several conditions is listed only under the first one.
+
+        Returns: { "Condition Name": [List of Suggestions], ... }
+        """
+        if isinstance(diseases, str):
+            diseases = [diseases]
+        if isinstance(symptoms, str):
+            symptoms = [symptoms]
+        # One scan over all extracted items; the separator keeps them apart
+        listed = " ; ".join([*(diseases or []), *(symptoms or [])])
+        conditions = self.find(listed) if listed else []
+        from_summary = False
+
+        # Fallback using Consultation Summary
+        if not conditions and consultation_summary:
+            conditions = self.find(consultation_summary)
+            from_summary = True
+
+        # Generic Fallback
+        if not conditions:
+            return {"General Wellness Advice (No specific match found)": GENERIC_CARE}
+
+        conditions.sort(key=lambda c: c[0] != "disease")
+        suggestion_map = {}
+        seen_tips = set()
+        for kind, key in conditions:
+            care = self.disease_care[key] if kind == "disease" else self.symptom_care[key]
+            tips = []
+            for tip in care:
+                norm = tip.lower().strip()
+                if norm not in seen_tips:
+                    seen_tips.add(norm)
+                    tips.append(tip)
+            if not tips:
+                continue
+            label = key.title()
+            if from_summary and kind == "disease":
+                label += " (from summary)"
+            suggestion_map[label] = tips
+        return suggestion_map
+
+
+_care_index = None
+_care_index_lock = threading.Lock()
+
+
+def get_care_index():
+    """Process-wide index over the built-in knowledge base, compiled once."""
+    global _care_index
+    with _care_index_lock:
+        if _care_index is None:
+            _care_index = CareIndex()
+        return _care_index
+
+
 def generate_care_suggestions(disease=None, symptoms=None, consultation_summary=None):
     """
     Generates a structured dictionary of care suggestions.
+    `disease` may be a single disease or a list of them.
     Returns: { "Condition Name": [List of Suggestions], ... }
     """
-    suggestion_map = {}
-    
-    # Normalize inputs
-    disease_str = disease.lower().strip() if disease else ""
-    symptom_list = [s.lower().strip() for s in symptoms] if symptoms else []
-    summary_text = consultation_summary.lower() if consultation_summary else ""
-
-    # Strategy 1: Disease-Based (Highest Priority)
-    if disease_str and disease_str in DISEASE_CARE:
-        suggestion_map[disease_str.title()] = DISEASE_CARE[disease_str]
-        return suggestion_map
+    return get_care_index().suggest(disease, symptoms, consultation_summary)
+
+def iter_raw_records(source):
+    """
+    Yield (default id, JSON text) pairs from an NDJSON file (one medical_data-style
+    object per line, e.g. the output of `medical_extractor.py --batch`) or a directory of
+    .json files. The default id is the line number or file name.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".json"):
+                with open(os.path.join(source, name), "r", encoding="utf-8") as f:
+                    yield os.path.splitext(name)[0], f.read()
+        return
+
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, line
+
+
+def _parse(default_id, text):
+    try:
+        record = json.loads(text)
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Skipping record {default_id}: {e}")
+        return None
+    if not isinstance(record, dict):
+        print(f"⚠️ Skipping record {default_id}: expected a JSON object, got {type(record).__name__}")
+        return None
+    return record.get("id", default_id), record
 
-    # Strategy 2: Symptom-Based
-    # We want to group suggestions by the symptom that triggered them
-    found_symptom_matches = set()
-    
-    for s in symptom_list:
-        for key in SYMPTOM_CARE:
-            if key in s: 
-                 found_symptom_matches.add(key)
-    
-    # Strategy 3: Fallback using Consultation Summary
-    if not disease_str and not found_symptom_matches and summary_text:
-        for d_key in DISEASE_CARE:
-            if d_key in summary_text:
-                suggestion_map[d_key.title() + " (from summary)"] = DISEASE_CARE[d_key]
-                return suggestion_map
-        
-        for s_key in SYMPTOM_CARE:
-            if s_key in summary_text:
-                found_symptom_matches.add(s_key)
-
-    # Compile Symptom Suggestions per Symptom
-    if found_symptom_matches:
-        for key in found_symptom_matches:
-            # key is the normalized symptom from KB (e.g. "fever")
-            # We add it to the map
-            suggestion_map[key.title()] = SYMPTOM_CARE[key]
-        return suggestion_map
 
-    # Strategy 4: Generic Fallback
-    suggestion_map["General Wellness Advice (No specific match found)"] = GENERIC_CARE
-    return suggestion_map
+def iter_records(source):
+    """Yield (id, record) pairs from an NDJSON file or a directory of .json files."""
+    for default_id, text in iter_raw_records(source):
+        parsed = _parse(default_id, text)
+        if parsed is not None:
+            yield parsed
+
+
+def _suggest_chunk(chunk):
+    # Runs in worker processes; the index is compiled once per process and reused
+    index = get_care_index()
+    return [
+        (rid, index.suggest(record.get("diseases"), record.get("symptoms"), record.get("summary")))
+        for rid, record in chunk
+    ]
+
+
+def _suggest_raw_chunk(chunk):
+    # Parsing and encoding happen in the worker too; only plain strings cross processes
+    index = get_care_index()
+    lines = []
+    for default_id, text in chunk:
+        parsed = _parse(default_id, text)
+        if parsed is None:
+            continue
+        rid, record = parsed
+        suggestions = index.suggest(record.get("diseases"), record.get("symptoms"), record.get("summary"))
+        lines.append(json.dumps({"id": rid, "suggestions": suggestions}, ensure_ascii=False) + "\n")
+    return lines
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _effective_workers(workers):
+    available = os.cpu_count() or 1
+    if workers > available:
+        print(f"⚠️ Only {available} CPU(s) available; using {available} worker(s) instead of {workers}.")
+    return min(workers, available)
+
+
+def _fan_out(fn, items, workers, chunk_size):
+    """Map `fn` over chunks of `items` on a process pool, yielding results in order."""
+    # Keep a bounded window of chunks in flight so memory does not grow with the input
+    with ProcessPoolExecutor(max_workers=workers, initializer=get_care_index) as pool:
+        pending = []
+        for chunk in _chunks(items, chunk_size):
+            pending.append(pool.submit(fn, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def suggest_batch(records, workers=1, chunk_size=2000):
+    """
+    Care suggestions for many records.
+
+    Matching costs only tens of microseconds per record, so in-process is the default
+    and usually fastest: worker processes pay to pickle every record and result. They
+    only help on large batches with several idle cores (see run_batch, which also moves
+    JSON parsing into the workers).
+
+    Args:
+        records (iterable): (id, record) pairs with "diseases", "symptoms" and optionally
+            "summary"; consumed lazily.
+        workers (int): Worker processes, capped at the CPU count.
+        chunk_size (int): Records per worker task.
+
+    Yields:
+        tuple: (id, suggestion map) in input order.
+    """
+    workers = _effective_workers(workers)
+    if workers <= 1:
+        for chunk in _chunks(records, chunk_size):
+            yield from _suggest_chunk(chunk)
+        return
+    yield from _fan_out(_suggest_chunk, records, workers, chunk_size)
+
+
+def run_batch(source, output_file, workers=1, chunk_size=2000):
+    """
+    Write one {"id", "suggestions"} line per record to `output_file` (NDJSON) as
+    results arrive.
+
+    With workers, the raw JSON text goes to the worker processes and comes back as
+    finished output lines. Decoding, matching and encoding are all spread out, leaving
+    the main process to read and write lines.
+
+    Returns:
+        dict: {"records", "seconds", "per_second"}
+    """
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    workers = _effective_workers(workers)
+    count = 0
+    start = time.perf_counter()
+    with open(output_file, "w", encoding="utf-8") as out:
+        if workers <= 1:
+            lines = (line for chunk in _chunks(iter_raw_records(source), chunk_size)
+                     for line in _suggest_raw_chunk(chunk))
+        else:
+            lines = _fan_out(_suggest_raw_chunk, iter_raw_records(source), workers, chunk_size)
+        for line in lines:
+            out.write(line)
+            count += 1
+
+    elapsed = time.perf_counter() - start
+    return {
+        "records": count,
+        "seconds": round(elapsed, 2),
+        "per_second": round(count / elapsed, 1) if elapsed else 0.0,
+    }
+
 
 def format_output(suggestion_map):
     """Formats the dictionary into a readable categorized string."""
@@ -266,11 +539,31 @@ def format_output(suggestion_map):
     return output
 
 if __name__ == "__main__":
-    import os
-    
+    import argparse
+
     # Determine path to medical_data.json (in transcriptions folder)
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     DATA_FILE = os.path.join(BASE_DIR, "transcriptions", "medical_data.json")
+
+    parser = argparse.ArgumentParser(description="General care suggestions for extracted conditions")
+    parser.add_argument("--batch", metavar="SOURCE", default=None,
+                        help="NDJSON file or directory of .json records to process in bulk")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "transcriptions", "care_suggestions.ndjson"),
+                        help="With --batch, NDJSON output file")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="With --batch, worker processes; only pays off for large batches on several idle cores")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="With --batch, records per worker task")
+    args = parser.parse_args()
+
+    if args.batch:
+        if not os.path.exists(args.batch):
+            print(f"❌ Not found: {args.batch}")
+            sys.exit(1)
+        print(f"📚 Batch care suggestions from: {args.batch}")
+        stats = run_batch(args.batch, args.output, workers=args.workers, chunk_size=args.chunk_size)
+        print(f"✅ {stats['records']} records in {stats['seconds']}s ({stats['per_second']}/s)")
+        print(f"💾 Saved to '{args.output}'")
+        sys.exit(0)
     
     print(f"📄 Loading medical data from: {DATA_FILE}")
     
@@ -281,13 +574,11 @@ if __name__ == "__main__":
             
             # Extract fields
             extracted_diseases = data.get("diseases", [])
-            primary_disease = extracted_diseases[0] if extracted_diseases else None
-            
             extracted_symptoms = data.get("symptoms", [])
             
-            print(f"🔍 Found: Disease='{primary_disease}', Symptoms={extracted_symptoms}\n")
+            print(f"🔍 Found: Diseases={extracted_diseases}, Symptoms={extracted_symptoms}\n")
             
-            sugg_map = generate_care_suggestions(disease=primary_disease, symptoms=extracted_symptoms)
+            sugg_map = generate_care_suggestions(disease=extracted_diseases, symptoms=extracted_symptoms)
             print(format_output(sugg_map))
             
         except Exception as e:
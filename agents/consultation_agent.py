@@ -0,0 +1,182 @@
+"""
+Structured Consultation Agent
+Single Gemini call that returns the corrected transcript, the clinical summary and the
+extracted diseases, symptoms and medicines as one JSON document, instead of separate
+correction and summary round trips followed by a spaCy pass.
+"""
+
+from google.genai import types
+import json
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import GEMINI_API_KEY
+from agents.gemini_cache import get_default_cache
+from agents.gemini_gateway import get_gateway, PRIORITY_HIGH
+
+MEDICINE_FIELDS = ["name", "dosage", "timing", "frequency", "duration"]
+
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "cleaned_text": {"type": "STRING"},
+        "summary": {"type": "STRING"},
+        "diseases": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "symptoms": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "medicines": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {field: {"type": "STRING"} for field in MEDICINE_FIELDS},
+                "required": ["name"],
+            },
+        },
+    },
+    "required": ["cleaned_text", "summary", "diseases", "symptoms", "medicines"],
+}
+
+
+def validate_response(payload):
+    """
+    Check a structured response and normalize it to the formats used downstream.
+
+    Returns:
+        dict: {"cleaned_text", "summary", "medical_data"} where medical_data matches
+            the medical_data.json layout produced by medical_extractor.
+
+    Raises:
+        ValueError: If the payload is missing fields or has the wrong types.
+    """
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Response is not valid JSON: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Response is not a JSON object.")
+
+    for field in ("cleaned_text", "summary"):
+        if not isinstance(payload.get(field), str) or not payload[field].strip():
+            raise ValueError(f"Missing or empty '{field}'.")
+
+    def string_list(field):
+        values = payload.get(field, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"'{field}' must be a list of strings.")
+        # Lowercase and de-duplicate, keeping first-seen order like the extractor
+        return list(dict.fromkeys(v.lower().strip() for v in values if v.strip()))
+
+    medicines = []
+    raw_medicines = payload.get("medicines", [])
+    if not isinstance(raw_medicines, list):
+        raise ValueError("'medicines' must be a list.")
+    for med in raw_medicines:
+        if not isinstance(med, dict) or not str(med.get("name", "")).strip():
+            continue
+        entry = {field: str(med.get(field) or "").strip() for field in MEDICINE_FIELDS}
+        entry["source"] = "llm_extracted"
+        medicines.append(entry)
+
+    return {
+        "cleaned_text": payload["cleaned_text"].strip(),
+        "summary": payload["summary"].strip(),
+        "medical_data": {
+            "diseases": string_list("diseases"),
+            "symptoms": string_list("symptoms"),
+            "medicines": medicines,
+        },
+    }
+
+
+class StructuredConsultationAgent:
+    # Bump whenever the prompt template or schema changes so cached results are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, known_entities=None, cache=None, use_cache=True, entity_index=None):
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is missing from configuration.")
+
+        self.gateway = get_gateway()
+        self.model_id = "gemini-flash-latest"
+        self.known_entities = known_entities or {}
+        self.entity_index = entity_index
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        self.config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=RESPONSE_SCHEMA,
+        )
+
+    def analyze(self, whisper_text, detected_language="en"):
+        """
+        Correct, summarize and extract medical data from a raw transcript in one call.
+
+        Returns:
+            dict: See validate_response.
+
+        Raises:
+            ValueError: If the model's answer does not match the schema.
+            Exception: API errors after the gateway's retries are exhausted.
+        """
+        entities = self.known_entities
+        if self.entity_index is not None:
+            entities = self.entity_index.entities_for(whisper_text, entities)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                self.model_id, self.PROMPT_VERSION, whisper_text,
+                entities=entities, language=detected_language
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("⚡ Using cached structured analysis.")
+                return validate_response(cached)
+
+        entities_context = "\n".join([f"- {k}: {v}" for k, v in entities.items()])
+
+        prompt = f"""
+        You are an expert medical transcriptionist and healthcare assistant.
+
+        Work on the consultation transcription below and fill every field of the JSON response.
+
+        cleaned_text:
+        1. Translate to English if the input is in another language.
+        2. Fix all spelling and grammar errors.
+        3. Normalize medical shorthand (e.g., "bp high" -> "blood pressure is high").
+        4. PROTECT the following known entities:
+        {entities_context}
+         Ensure these specific names and details are spelled exactly as provided above.
+
+        summary:
+        A clear and structured clinical note in simple English covering symptoms, duration,
+        severity, advice / medicines and further consultation details (if mentioned).
+        Do not add new information.
+
+        diseases, symptoms:
+        Conditions and symptoms explicitly mentioned, as short lowercase phrases.
+
+        medicines:
+        Every medicine prescribed or mentioned, with dosage (e.g. 500mg), timing
+        (e.g. after food), frequency (e.g. twice a day, 1-0-1) and duration (e.g. 5 days).
+        Leave a field empty when it is not stated.
+
+        INPUT TEXT:
+        "{whisper_text}"
+        """
+
+        response = self.gateway.generate(prompt, model=self.model_id, priority=PRIORITY_HIGH,
+                                         config=self.config)
+        result = validate_response(response.text)
+        if cache_key is not None:
+            self.cache.put(cache_key, response.text)
+        return result
+
+
+if __name__ == "__main__":
+    # Test
+    agent = StructuredConsultationAgent(known_entities={"name": "Aysha Saheera"})
+    test_text = "My name is aisha sahara, i have fever and cough since 3 days. Take paracetamol 500mg twice a day for 5 days."
+    print(json.dumps(agent.analyze(test_text), indent=2))
@@ -0,0 +1,263 @@
+"""
+Entity Index
+Indexes a large directory of staff, patient and hospital names so that only the entities
+that plausibly occur in a transcript are injected into the correction prompt. Candidates
+are found through phonetic keys (Whisper misspells names but usually keeps their sound)
+and then verified with rapidfuzz.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import threading
+from collections import Counter, defaultdict
+
+from rapidfuzz import fuzz
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import ENTITY_DIRECTORY, ENTITY_MATCH_THRESHOLD, ENTITY_MAX_INJECTED
+
+MIN_TOKEN_LEN = 3
+STOPWORDS = {"and", "the", "for", "of", "dr", "mr", "mrs", "ms"}
+
+# Soundex-style consonant classes; vowels and h/w/y carry no code
+_PHONETIC_CODES = {}
+for _code, _letters in (("1", "bfpv"), ("2", "cgjkqsxz"), ("3", "dt"), ("4", "l"), ("5", "mn"), ("6", "r")):
+    for _letter in _letters:
+        _PHONETIC_CODES[_letter] = _code
+
+
+_WORD = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+
+
+def normalize(text):
+    """Lowercase words without punctuation, as used for keys and scoring."""
+    return [m.group().lower() for m in _WORD.finditer(text)]
+
+
+def phonetic_key(word):
+    """
+    Simplified Soundex key. Unlike classic Soundex the first letter is also encoded, so
+    "Kavya"/"Cavya" and "Aisha"/"Aysha" share a key.
+    """
+    word = word.lower().replace("ph", "f")
+    if not word:
+        return ""
+    key = _PHONETIC_CODES.get(word[0], "A" if word[0].isalpha() else word[0])
+    last = key
+    for ch in word[1:]:
+        code = _PHONETIC_CODES.get(ch)
+        if code is None:
+            if ch not in "hw":
+                last = ""  # vowels separate repeated codes, h and w do not
+            continue
+        if code != last:
+            key += code
+        last = code
+        if len(key) >= 4:
+            break
+    return key
+
+
+class EntityIndex:
+    def __init__(self, entities, block_tokens=2):
+        """
+        Args:
+            entities (iterable): (category, value) pairs, e.g. ("doctor", "Dr. Anil Kumar").
+            block_tokens (int): How many of each entity's rarest words are indexed. Common
+                words such as "hospital" would otherwise pull in thousands of candidates.
+        """
+        self.entities = []
+        self._tokens = []
+        seen = set()
+        for category, value in entities:
+            value = str(value).strip()
+            tokens = normalize(value)
+            if not tokens or (category, value) in seen:
+                continue
+            seen.add((category, value))
+            self.entities.append((str(category).strip() or "entity", value))
+            self._tokens.append(tokens)
+
+        self._df = Counter(token for tokens in self._tokens for token in set(tokens))
+        self._postings = defaultdict(list)
+        for eid, tokens in enumerate(self._tokens):
+            indexable = [(j, t) for j, t in enumerate(tokens) if len(t) >= MIN_TOKEN_LEN and t not in STOPWORDS]
+            if not indexable:
+                indexable = list(enumerate(tokens))
+            for j, token in sorted(indexable, key=lambda jt: self._df[jt[1]])[:block_tokens]:
+                self._postings[phonetic_key(token)].append((eid, j))
+
+    def __len__(self):
+        return len(self.entities)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Load an entity directory from JSON, JSONL, CSV or TSV.
+
+        JSON may be {"category": ["value", ...]} or a list of objects; JSONL has one object
+        per line; CSV/TSV need a header with "category" and "value" (or "name") columns.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        with open(path, "r", encoding="utf-8") as f:
+            if ext == ".json":
+                data = json.load(f)
+                if isinstance(data, dict):
+                    entities = [(category, value)
+                                for category, values in data.items()
+                                for value in (values if isinstance(values, list) else [values])]
+                else:
+                    entities = [_from_record(record) for record in data]
+            elif ext == ".jsonl":
+                entities = [_from_record(json.loads(line)) for line in f if line.strip()]
+            elif ext in (".csv", ".tsv"):
+                reader = csv.DictReader(f, delimiter="\t" if ext == ".tsv" else ",")
+                entities = [_from_record(row) for row in reader]
+            else:
+                raise ValueError(f"Unsupported entity directory format: {path}")
+        return cls([e for e in entities if e is not None], **kwargs)
+
+    def select(self, text, limit=ENTITY_MAX_INJECTED, threshold=ENTITY_MATCH_THRESHOLD):
+        """
+        Entities that plausibly occur in `text`, best match first.
+
+        Returns:
+            list: (category, value, score) tuples, at most `limit` of them.
+        """
+        words = normalize(text)
+        scored = []
+        for eid, positions in self._hits(words).items():
+            score = self._score(eid, words, positions)
+            if score >= threshold:
+                scored.append((score, eid))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+
+        return [(*self.entities[eid], round(score, 1)) for score, eid in scored[:limit]]
+
+    def locate(self, text, threshold=ENTITY_MATCH_THRESHOLD):
+        """
+        Spans of `text` that spell out a whole entity, e.g. "aisha sahara" for
+        "Aysha Saheera". Overlaps are resolved in favour of the better match.
+
+        Returns:
+            list: (start, end, category, value, score) tuples in text order, with
+                `text[start:end]` the matched span.
+        """
+        spans = [(m.group().lower(), m.start(), m.end()) for m in _WORD.finditer(text)]
+        words = [w for w, _, _ in spans]
+        candidates = []
+        for eid, positions in self._hits(words).items():
+            n = len(self._tokens[eid])
+            for i, j in positions:
+                start = i - j
+                if start < 0 or start + n > len(words):
+                    continue
+                score = self._window_score(eid, words[start:start + n])
+                if score >= threshold:
+                    candidates.append((score, start, start + n, eid))
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+
+        taken = set()
+        result = []
+        for score, a, b, eid in candidates:
+            if taken.intersection(range(a, b)):
+                continue
+            taken.update(range(a, b))
+            result.append((spans[a][1], spans[b - 1][2], *self.entities[eid], round(score, 1)))
+        return sorted(result)
+
+    def _hits(self, words):
+        """Candidate entities sharing a phonetic key with the text: {eid: [(word pos, token pos)]}."""
+        hits = defaultdict(list)
+        for i, word in enumerate(words):
+            if len(word) < MIN_TOKEN_LEN or word in STOPWORDS:
+                continue
+            for eid, j in self._postings.get(phonetic_key(word), ()):
+                hits[eid].append((i, j))
+        return hits
+
+    def _window_score(self, eid, window):
+        # Agreeing phonetic keys make up for spelling differences such as
+        # "aisha sahara"/"aysha saheera"
+        tokens = self._tokens[eid]
+        sounds_alike = sum(phonetic_key(w) == phonetic_key(t) for w, t in zip(window, tokens)) / len(tokens)
+        return 0.6 * fuzz.ratio(" ".join(window), " ".join(tokens)) + 40 * sounds_alike
+
+    def _score(self, eid, words, positions):
+        tokens = self._tokens[eid]
+        best = 0.0
+        for i, j in positions:
+            # Compare the transcript words aligned with the whole entity
+            start = max(0, i - j)
+            best = max(best, self._window_score(eid, words[start:start + len(tokens)]))
+            # A word unique to this entity (e.g. "KMCT") identifies it on its own
+            token = tokens[j]
+            if self._df[token] == 1 and len(token) >= 4:
+                single = fuzz.ratio(words[i], token)
+                if single >= 90:
+                    best = max(best, single)
+        return best
+
+    def entities_for(self, text, known_entities=None, **kwargs):
+        """
+        `known_entities` extended with the selected entities, in the {label: value} form
+        the Gemini prompts use. Repeated categories are numbered ("doctor", "doctor 2").
+        """
+        merged = dict(known_entities or {})
+        present = set(merged.values())
+        counts = Counter()
+        for label in merged:
+            counts[label] += 1
+        for category, value, _ in self.select(text, **kwargs):
+            if value in present:
+                continue
+            present.add(value)
+            counts[category] += 1
+            label = category if counts[category] == 1 else f"{category} {counts[category]}"
+            while label in merged:
+                counts[category] += 1
+                label = f"{category} {counts[category]}"
+            merged[label] = value
+        return merged
+
+
+def _from_record(record):
+    value = record.get("value") or record.get("name")
+    if not value:
+        return None
+    return record.get("category") or record.get("type") or "entity", value
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_entity_index():
+    """Process-wide index over ENTITY_DIRECTORY, or None when no directory is configured."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None and ENTITY_DIRECTORY:
+            if not os.path.exists(ENTITY_DIRECTORY):
+                print(f"Warning: Entity directory '{ENTITY_DIRECTORY}' not found.")
+                return None
+            _default_index = EntityIndex.from_file(ENTITY_DIRECTORY)
+            print(f"📇 Indexed {len(_default_index)} entities from '{ENTITY_DIRECTORY}'")
+        return _default_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show which directory entities match a transcript")
+    parser.add_argument("directory", help="Entity directory (JSON, JSONL, CSV or TSV)")
+    parser.add_argument("text", help="Transcript text")
+    args = parser.parse_args()
+
+    index = EntityIndex.from_file(args.directory)
+    for category, value, score in index.select(args.text):
+        print(f"{score:5.1f}  {category}: {value}")
@@ -0,0 +1,141 @@
+"""
+Formulary Index
+Resolves medicine names heard by Whisper ("azithromicin", "dolo par") to formulary
+entries. Character trigrams narrow 100k+ brand and generic names down to a short list,
+and only that list is scored with rapidfuzz, so a lookup stays well under a millisecond.
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+from itertools import chain
+from collections import Counter, defaultdict
+
+from rapidfuzz import fuzz, process
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import FORMULARY_MATCH_THRESHOLD
+
+
+def normalize_name(text):
+    """Lowercase letters and digits only, so "Dolo 650" and "dolo-650" compare equal."""
+    return re.sub(r"[^a-z0-9]+", "", text.lower())
+
+
+def trigrams(norm):
+    padded = f"#{norm}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FormularyIndex:
+    def __init__(self, entries, posting_budget=3000):
+        """
+        Args:
+            entries (iterable): (name, generic name) pairs, e.g. ("Dolo 650",
+                "Paracetamol"). A generic may leave the second item empty.
+            posting_budget (int): Roughly how many postings a lookup may count. The
+                query's rarest trigrams are used first; common ones such as "ine" are
+                only counted while the budget allows.
+        """
+        self.names = []
+        self.generic = []
+        self._norms = []
+        self._exact = {}
+        self._postings = defaultdict(list)
+        self.posting_budget = posting_budget
+
+        for name, generic in entries:
+            name = str(name).strip()
+            norm = normalize_name(name)
+            if not norm or norm in self._exact:
+                continue
+            idx = len(self.names)
+            self.names.append(name)
+            self.generic.append(str(generic or name).strip())
+            self._norms.append(norm)
+            self._exact[norm] = idx
+            for gram in trigrams(norm):
+                self._postings[gram].append(idx)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Load a formulary from TXT (one name per line), CSV/TSV or JSONL. CSV/TSV/JSONL
+        use a "name" column and an optional "generic" column.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            if ext == ".txt":
+                rows = ({"name": line.strip()} for line in f if line.strip())
+            elif ext == ".jsonl":
+                rows = (json.loads(line) for line in f if line.strip())
+            elif ext in (".csv", ".tsv"):
+                rows = csv.DictReader(f, delimiter="\t" if ext == ".tsv" else ",")
+            else:
+                raise ValueError(f"Unsupported formulary format: {path}")
+            entries = [(row.get("name"), row.get("generic"))
+                       for row in rows if row.get("name")]
+        return cls(entries, **kwargs)
+
+    def shortlist(self, norm, size=50):
+        """Indices of the names sharing the most trigrams with `norm`."""
+        postings = sorted((self._postings[g] for g in trigrams(norm) if g in self._postings), key=len)
+        chosen = []
+        counted = 0
+        for posting in postings:
+            # Always count a few trigrams, so one misheard syllable cannot hide the name
+            if len(chosen) >= 3 and counted + len(posting) > self.posting_budget:
+                break
+            counted += len(posting)
+            chosen.append(posting)
+        return [idx for idx, _ in Counter(chain.from_iterable(chosen)).most_common(size)]
+
+    def lookup(self, text, threshold=FORMULARY_MATCH_THRESHOLD, shortlist_size=50):
+        """
+        Best formulary match for `text`.
+
+        Returns:
+            tuple: (formulary name, generic name, score) or None if nothing scores
+                `threshold`.
+        """
+        norm = normalize_name(text)
+        if len(norm) < 4:
+            return None
+        idx = self._exact.get(norm)
+        if idx is not None:
+            return self.names[idx], self.generic[idx], 100.0
+
+        candidates = self.shortlist(norm, shortlist_size)
+        if not candidates:
+            return None
+        best = process.extractOne(norm, [self._norms[i] for i in candidates], scorer=fuzz.ratio,
+                                  score_cutoff=threshold)
+        if best is None:
+            return None
+        idx = candidates[best[2]]
+        return self.names[idx], self.generic[idx], round(best[1], 1)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Resolve medicine names against a formulary")
+    parser.add_argument("formulary", help="TXT, CSV, TSV or JSONL formulary")
+    parser.add_argument("names", nargs="+", help="Names to look up")
+    args = parser.parse_args()
+
+    index = FormularyIndex.from_file(args.formulary)
+    print(f"💊 {len(index)} formulary names")
+    for name in args.names:
+        start = time.perf_counter()
+        match = index.lookup(name)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{name!r} -> {match} ({elapsed_ms:.3f} ms)")
@@ -0,0 +1,146 @@
+"""
+Gemini Response Cache
+Content-addressed on-disk cache for Gemini responses. Re-running an unchanged transcript
+through the correction or summary agents returns the stored answer instead of spending
+latency and quota on a new request.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import GEMINI_CACHE_PATH, GEMINI_CACHE_MAX_ENTRIES, GEMINI_CACHE_TTL_HOURS
+
+
+class GeminiResponseCache:
+    """
+    SQLite-backed cache with a size cap (least recently used entries are evicted),
+    a time-to-live, and hit/miss statistics.
+    """
+
+    def __init__(self, path=GEMINI_CACHE_PATH, max_entries=GEMINI_CACHE_MAX_ENTRIES,
+                 ttl_hours=GEMINI_CACHE_TTL_HOURS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model_id, prompt_version, text, entities=None, **extra):
+        """
+        Hash everything that determines the response: model, prompt template version,
+        known entities and input text (plus any extra parameters such as language).
+        """
+        payload = json.dumps({
+            "model": model_id,
+            "prompt_version": prompt_version,
+            "entities": entities or {},
+            "text": text,
+            "extra": extra,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+        self.evictions += max(0, expired) + max(0, overflow)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache shared by all Gemini agents."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = GeminiResponseCache()
+        return _default_cache
+
+
+if __name__ == "__main__":
+    cache = get_default_cache()
+    if "--clear" in sys.argv:
+        cache.clear()
+        print("🗑️  Gemini cache cleared.")
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,605 @@
+"""
+Gemini Gateway
+Single shared access layer for every Gemini agent. All requests go through one client
+(one pooled HTTP connection set), a token-bucket rate limiter sized to the project quota,
+and a priority queue served by a fixed number of workers. Quota errors are retried with
+jittered exponential backoff, honouring any retry delay the server sends back.
+
+Tail latency is bounded by a per-call deadline, a hedged duplicate request once a call
+runs past a learned latency percentile, and a circuit breaker that fails fast after
+repeated failures so callers can fall back immediately.
+"""
+
+from google import genai
+from google.genai import types
+import re
+import sys
+import os
+import time
+import heapq
+import queue
+import random
+import weakref
+import itertools
+import threading
+from concurrent.futures import Future, CancelledError, wait, FIRST_COMPLETED
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import (
+    GEMINI_API_KEY,
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_BURST,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MAX_RETRIES,
+    GEMINI_DEADLINE_SECONDS,
+    GEMINI_HEDGE_PERCENTILE,
+    GEMINI_BREAKER_FAILURES,
+    GEMINI_BREAKER_RESET_SECONDS,
+)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_STATUSES = ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not complete within its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, calls are rejected
+    immediately; after `reset_seconds` a single trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=GEMINI_BREAKER_FAILURES, reset_seconds=GEMINI_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Return False while open, "trial" for the single half-open trial, else True."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return "trial"
+
+    def release_trial(self):
+        """The trial call was dropped before reaching Gemini; let the next call be the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    print(f"🔌 Gemini circuit opened after {self._failures} failures.")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._samples = self._samples[-self.window:]
+
+    def percentile(self, p):
+        """Latency at percentile `p`, or None until enough samples are collected."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class TokenBucket:
+    """Blocking token bucket. `pause` stops all issuance until a given time."""
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def acquire(self, timeout=None):
+        """
+        Block until a token is available; returns the seconds spent waiting, or None if
+        no token became available within `timeout` seconds.
+        """
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return now - started
+                    wait = (1 - self._tokens) / self.rate
+            if timeout is not None:
+                left = timeout - (now - started)
+                if left <= 0:
+                    return None
+                wait = min(wait, left)
+            time.sleep(wait)
+
+
+def is_retryable(error):
+    code = getattr(error, "code", None)
+    if code in RETRYABLE_CODES:
+        return True
+    text = str(error)
+    return "429" in text or any(status in text for status in RETRYABLE_STATUSES)
+
+
+def retry_after(error):
+    """Extract a server-suggested retry delay (seconds) from a Gemini error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+
+    # google.rpc.RetryInfo, e.g. {"retryDelay": "20s"}
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"]([\d.]+)s", str(getattr(error, "details", "") or error))
+    return float(match.group(1)) if match else None
+
+
+class _Job:
+    def __init__(self, priority, kwargs):
+        self.priority = priority
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempt = 0
+        self.enqueued_at = time.monotonic()
+        # Set when the first attempt is sent, i.e. after queueing and rate limiting
+        self.started = threading.Event()
+        self.cancelled = False
+        self.trial = False
+
+    def cancel(self):
+        """
+        Give up on the job. A queued future is cancelled outright; a running one cannot
+        be, so the flag stops the worker from retrying it.
+        """
+        self.cancelled = True
+        self.future.cancel()
+
+
+class GeminiGateway:
+    def __init__(self, api_key=GEMINI_API_KEY, requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+                 burst=GEMINI_BURST, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                 max_retries=GEMINI_MAX_RETRIES, base_delay=2.0, max_delay=60.0,
+                 deadline=GEMINI_DEADLINE_SECONDS, hedge_percentile=GEMINI_HEDGE_PERCENTILE):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is missing from configuration.")
+
+        # The HTTP timeout bounds each individual attempt; `deadline` also bounds queueing
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(timeout=int(deadline * 1000)) if deadline else None,
+        )
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        # Future -> job, so callers holding only the future can cancel it
+        self._jobs = weakref.WeakKeyDictionary()
+        self._metrics = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0,
+                         "hedges": 0, "deadline_exceeded": 0, "short_circuited": 0, "abandoned": 0}
+        self._waits = []
+
+        for i in range(max_concurrency):
+            threading.Thread(target=self._worker, name=f"gemini-{i}", daemon=True).start()
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def submit(self, contents, model, priority=PRIORITY_NORMAL, config=None):
+        """
+        Queue a generate_content call and return a Future for the response.
+
+        Raises:
+            CircuitOpenError: If recent calls kept failing and the breaker is open.
+        """
+        return self._submit_job(contents, model, priority, config).future
+
+    def generate(self, contents, model, priority=PRIORITY_NORMAL, config=None, deadline=None, hedge=True):
+        """
+        Blocking generate_content through the shared queue and limiter.
+
+        If the call is still running once it passes the learned latency percentile, a
+        duplicate request is sent and whichever answers first wins. The hedge clock starts
+        when the request is actually sent, since the percentile only covers call time and
+        not time spent queued behind the rate limiter.
+
+        A call that expires while still queued or waiting for a rate-limit token is counted
+        as a missed deadline but not as a circuit breaker failure: Gemini was never asked,
+        so only local backpressure was slow.
+
+        Args:
+            deadline (float): Seconds to wait in total (defaults to the gateway deadline).
+            hedge (bool): Allow a hedged duplicate request.
+
+        Raises:
+            CircuitOpenError: If the breaker is open.
+            DeadlineExceeded: If no response arrived within the deadline.
+        """
+        deadline = deadline or self.deadline
+        started = time.monotonic()
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+
+        jobs = [self._submit_job(contents, model, priority, config)]
+
+        hedge_after = self.latency.percentile(self.hedge_percentile) if hedge else None
+        if hedge_after is not None and jobs[0].started.wait(timeout=remaining()):
+            left = remaining()
+            if left is None or hedge_after < left:
+                done, _ = wait([jobs[0].future], timeout=hedge_after)
+                if not done:
+                    with self._cond:
+                        self._metrics["hedges"] += 1
+                    try:
+                        jobs.append(self._submit_job(contents, model, priority, config))
+                    except CircuitOpenError:
+                        pass
+
+        by_future = {job.future: job for job in jobs}
+        while True:
+            done, pending = wait(list(by_future), timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                self._give_up(jobs, deadline_exceeded=True)
+                raise DeadlineExceeded(f"Gemini call exceeded its {deadline:g}s deadline.")
+
+            succeeded = [f for f in done if f.exception() is None]
+            if succeeded or not pending:
+                for future in pending:
+                    by_future[future].cancel()
+                return (succeeded or list(done))[0].result()
+            # The first finisher failed but a duplicate is still running; wait for it
+            by_future = {f: by_future[f] for f in pending}
+
+    def cancel(self, *futures, deadline_exceeded=False):
+        """
+        Give up on calls returned by `submit`: drop them if still queued and stop any
+        further retries.
+
+        Args:
+            deadline_exceeded (bool): The caller gave up because its deadline passed. As in
+                `generate`, this counts as one missed deadline, and as one circuit breaker
+                failure only if any of the calls had reached Gemini.
+        """
+        with self._cond:
+            jobs = [job for job in (self._jobs.pop(f, None) for f in futures) if job is not None]
+        self._give_up(jobs, deadline_exceeded)
+
+    def stream(self, contents, model, config=None, deadline=None):
+        """
+        Streaming generate_content. Yields response chunks as they arrive.
+
+        Streaming calls take a token from the shared limiter. Retryable errors are retried
+        with backoff only until the first chunk has been received.
+
+        The whole stream, including rate limiting, retry backoff, the wait for the first
+        chunk and the time between chunks, runs under one deadline. When it passes, or
+        the circuit opens between retries, the generator raises so the caller can fall
+        back instead of waiting on a stalled stream.
+
+        Args:
+            deadline (float): Seconds for the whole stream (defaults to the gateway deadline).
+
+        Raises:
+            CircuitOpenError: If the breaker is open (checked before iterating and before
+                each retry).
+            DeadlineExceeded: If the stream does not finish within the deadline.
+        """
+        # Checked eagerly so callers can fall back before iterating
+        allowed = self._check_circuit()
+        kwargs = {"model": model, "contents": contents}
+        if config is not None:
+            kwargs["config"] = config
+        return self._stream(kwargs, deadline or self.deadline, trial=allowed == "trial")
+
+    def _stream(self, kwargs, deadline, trial=False):
+        started = time.monotonic()
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+
+        def expired(reached):
+            with self._cond:
+                self._metrics["deadline_exceeded"] += 1
+            if reached:
+                self.breaker.record_failure()
+            elif trial:
+                self.breaker.release_trial()
+            return DeadlineExceeded(f"Gemini stream exceeded its {deadline:g}s deadline.")
+
+        attempt = 0
+        while True:
+            if attempt:
+                self._check_circuit()
+            waited = self.bucket.acquire(timeout=remaining())
+            if waited is None:
+                # Only local rate limiting was slow (unless an earlier attempt failed)
+                raise expired(reached=attempt > 0)
+            with self._cond:
+                self._metrics["submitted"] += 1
+                self._waits.append(waited)
+                self._waits = self._waits[-1000:]
+                self._in_flight += 1
+
+            # The HTTP iterator blocks between chunks, so it is drained on a helper thread
+            # and the deadline is enforced while waiting on the queue
+            chunks = queue.Queue()
+            stop = threading.Event()
+            threading.Thread(target=self._pump_stream, args=(kwargs, chunks, stop), daemon=True).start()
+
+            received = False
+            error = None
+            try:
+                while True:
+                    try:
+                        kind, item = chunks.get(timeout=remaining())
+                    except queue.Empty:
+                        raise expired(reached=True) from None
+                    if kind == "chunk":
+                        received = True
+                        yield item
+                    elif kind == "error":
+                        error = item
+                        break
+                    else:
+                        break
+            except GeneratorExit:
+                # The consumer stopped early; Gemini was answering, so this is no failure
+                self.breaker.record_success()
+                raise
+            finally:
+                stop.set()
+                with self._cond:
+                    self._in_flight -= 1
+
+            if error is None:
+                with self._cond:
+                    self._metrics["completed"] += 1
+                self.breaker.record_success()
+                return
+
+            retry = not received and is_retryable(error) and attempt < self.max_retries
+            delay = self._backoff(attempt, error) if retry else 0.0
+            left = remaining()
+            if retry and left is not None and delay >= left:
+                # Sleeping would use up the rest of the budget
+                raise expired(reached=True) from error
+            with self._cond:
+                self._metrics["retries" if retry else "failed"] += 1
+            if not retry:
+                self.breaker.record_failure()
+                raise error
+            attempt += 1
+            print(f"⚠️ Gemini busy ({getattr(error, 'code', 'error')}). Retry {attempt} in {delay:.1f}s...")
+            time.sleep(delay)
+
+    def _pump_stream(self, kwargs, chunks, stop):
+        """Feed a streaming call into `chunks`; stops reading once `stop` is set."""
+        try:
+            stream = self.client.models.generate_content_stream(**kwargs)
+            for chunk in stream:
+                if stop.is_set():
+                    getattr(stream, "close", lambda: None)()
+                    return
+                chunks.put(("chunk", chunk))
+        except Exception as e:
+            chunks.put(("error", e))
+        else:
+            chunks.put(("done", None))
+
+    def metrics(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                **self._metrics,
+                "queue_depth": len(self._heap),
+                "circuit": self.breaker.state,
+                "in_flight": self._in_flight,
+                "wait_avg_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_p95_s": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "wait_max_s": round(waits[-1], 3) if waits else 0.0,
+            }
+
+    # ---------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------
+    def _check_circuit(self):
+        allowed = self.breaker.allow()
+        if not allowed:
+            with self._cond:
+                self._metrics["short_circuited"] += 1
+            raise CircuitOpenError("Gemini circuit is open after repeated failures.")
+        return allowed
+
+    def _submit_job(self, contents, model, priority, config):
+        allowed = self._check_circuit()
+        job = _Job(priority, {"model": model, "contents": contents, "config": config})
+        job.trial = allowed == "trial"
+        with self._cond:
+            self._metrics["submitted"] += 1
+            self._jobs[job.future] = job
+        self._enqueue(job)
+        return job
+
+    def _give_up(self, jobs, deadline_exceeded=False):
+        """
+        Cancel jobs a caller no longer waits for. A missed deadline is a breaker failure
+        only if one of the jobs reached Gemini; jobs that expired while queued or rate
+        limited say nothing about the API, and a half-open trial among them is handed on.
+        """
+        for job in jobs:
+            job.cancel()
+        reached = any(job.started.is_set() for job in jobs)
+        if not reached and any(job.trial for job in jobs):
+            self.breaker.release_trial()
+        if deadline_exceeded:
+            with self._cond:
+                self._metrics["deadline_exceeded"] += 1
+            if reached:
+                self.breaker.record_failure()
+
+    def _abandon(self, job):
+        """Drop a job its caller gave up on; its failure was already counted by the caller."""
+        with self._cond:
+            self._metrics["abandoned"] += 1
+        if not job.future.done():
+            job.future.set_exception(CancelledError())
+
+    def _enqueue(self, job):
+        with self._cond:
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+            self._cond.notify()
+
+    def _backoff(self, attempt, error):
+        hinted = retry_after(error)
+        if hinted is not None:
+            # The server knows when quota returns; hold every request until then
+            self.bucket.pause(hinted)
+            return hinted
+        # Full jitter keeps concurrent consultations from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                # Skip jobs whose caller already gave up (deadline passed or hedge lost)
+                if job.attempt == 0 and not job.future.set_running_or_notify_cancel():
+                    self._metrics["abandoned"] += 1
+                    continue
+            if job.cancelled:
+                self._abandon(job)
+                continue
+
+            self.bucket.acquire()
+            # Marked before the cancelled check, so a caller that gives up and then sees
+            # `started` unset knows the call will not be sent
+            job.started.set()
+            if job.cancelled:
+                # Gave up while waiting for a token; the token is lost but no call is made
+                self._abandon(job)
+                continue
+            with self._cond:
+                self._in_flight += 1
+                self._waits.append(time.monotonic() - job.enqueued_at)
+                self._waits = self._waits[-1000:]
+
+            call_started = time.monotonic()
+            try:
+                response = self.client.models.generate_content(
+                    **{k: v for k, v in job.kwargs.items() if v is not None}
+                )
+            except Exception as e:
+                with self._cond:
+                    self._in_flight -= 1
+                if job.cancelled:
+                    self._abandon(job)
+                    continue
+                retry = is_retryable(e) and job.attempt < self.max_retries
+                with self._cond:
+                    self._metrics["retries" if retry else "failed"] += 1
+                if retry:
+                    delay = self._backoff(job.attempt, e)
+                    job.attempt += 1
+                    print(f"⚠️ Gemini busy ({getattr(e, 'code', 'error')}). Retry {job.attempt} in {delay:.1f}s...")
+                    job.enqueued_at = time.monotonic() + delay
+                    threading.Timer(delay, self._enqueue, args=(job,)).start()
+                else:
+                    self.breaker.record_failure()
+                    job.future.set_exception(e)
+                continue
+
+            self.latency.add(time.monotonic() - call_started)
+            self.breaker.record_success()
+            with self._cond:
+                self._in_flight -= 1
+                self._metrics["completed"] += 1
+            job.future.set_result(response)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway shared by all Gemini agents."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = GeminiGateway()
+        return _gateway
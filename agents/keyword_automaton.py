@@ -0,0 +1,143 @@
+"""
+Keyword Automaton
+Pure-Python Aho-Corasick matcher for dictionaries of phrases (medical shorthand, medicine
+names, care keywords). All keywords are found in one pass over the text, so the cost grows
+with the text length rather than with the number of keywords.
+"""
+
+
+class KeywordAutomaton:
+    def __init__(self, keywords=None, case_sensitive=False, whole_words=True):
+        """
+        Args:
+            keywords (dict or iterable): Keywords to add; a dict maps each keyword to a
+                value returned with its matches (e.g. the expansion or a category).
+            case_sensitive (bool): Match case exactly instead of case-insensitively.
+            whole_words (bool): Only report matches bounded by non-alphanumeric characters,
+                so "od" does not fire inside "food".
+        """
+        self.case_sensitive = case_sensitive
+        self.whole_words = whole_words
+        self._goto = [{}]
+        self._fail = [0]
+        self._own = [[]]  # keywords ending exactly at each state
+        self._out = [[]]  # ...plus those ending at its failure states
+        self._keywords = []
+        self._built = False
+
+        if keywords:
+            items = keywords.items() if isinstance(keywords, dict) else ((k, k) for k in keywords)
+            for keyword, value in items:
+                self.add(keyword, value)
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def _fold(self, text):
+        if self.case_sensitive:
+            return text
+        folded = text.lower()
+        if len(folded) != len(text):
+            # A few characters (e.g. "İ") change length when lowercased; keep offsets aligned
+            folded = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+        return folded
+
+    def add(self, keyword, value=None):
+        """Add a keyword. Adding the same keyword again replaces its value."""
+        key = self._fold(keyword.strip())
+        if not key:
+            return
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+                self._out.append([])
+            state = nxt
+        if self._own[state]:
+            self._keywords[self._own[state][0]] = (key, keyword if value is None else value)
+            return
+        self._own[state].append(len(self._keywords))
+        self._keywords.append((key, keyword if value is None else value))
+        self._built = False
+
+    def build(self):
+        """Compute failure links. Called automatically before the first search."""
+        queue = []
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            self._out[state] = list(self._own[state])
+            queue.append(state)
+        # Breadth-first, so every failure state is finished before it is inherited from
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._own[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter_matches(self, text):
+        """
+        Yield every match, overlapping ones included, in order of end position.
+
+        Yields:
+            tuple: (start, end, keyword, value) with `text[start:end]` the matched span.
+        """
+        if not self._built:
+            self.build()
+        folded = self._fold(text)
+        goto, fail, out, keywords = self._goto, self._fail, self._out, self._keywords
+        n = len(text)
+        state = 0
+        for pos, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = pos + 1
+            for idx in out[state]:
+                keyword, value = keywords[idx]
+                start = end - len(keyword)
+                if self.whole_words and not (
+                    (start == 0 or not text[start - 1].isalnum()) and (end == n or not text[end].isalnum())
+                ):
+                    continue
+                yield start, end, keyword, value
+
+    def find_all(self, text):
+        """
+        Non-overlapping matches, choosing the leftmost and then the longest keyword
+        ("bp high" wins over "bp").
+
+        Returns:
+            list: (start, end, keyword, value) tuples in text order.
+        """
+        matches = sorted(self.iter_matches(text), key=lambda m: (m[0], m[0] - m[1]))
+        result = []
+        last_end = 0
+        for match in matches:
+            if match[0] >= last_end:
+                result.append(match)
+                last_end = match[1]
+        return result
+
+    def replace(self, text, repl=None):
+        """
+        Replace every leftmost-longest match with its value, or with `repl(match)` if given.
+        """
+        parts = []
+        last = 0
+        for match in self.find_all(text):
+            parts.append(text[last:match[0]])
+            parts.append(repl(match) if repl else str(match[3]))
+            last = match[1]
+        parts.append(text[last:])
+        return "".join(parts)
@@ -0,0 +1,205 @@
+"""
+Live Transcription Agent
+Transcribes the consultation while it is still being recorded. The recorder hands audio
+blocks to a pause-based segmenter, and each completed segment is sent to Whisper in the
+background, so the transcript is nearly complete as soon as recording stops.
+"""
+
+import numpy as np
+import threading
+import queue
+import time
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.audio_agent import record_audio
+from agents.transcription_agent import post_process_transcript
+from agents.whisper_server import get_model, WhisperServerClient
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+class PauseSegmenter:
+    """
+    Cuts a stream of audio into speech segments at pauses.
+
+    Audio is examined in short frames; once a run of quiet frames at least `pause_seconds`
+    long follows `min_segment_seconds` of audio, the segment is closed. Segments are always
+    closed at `max_segment_seconds` so a long monologue cannot delay transcription.
+    """
+
+    def __init__(self, fs=WHISPER_SAMPLE_RATE, frame_ms=30, pause_seconds=0.6,
+                 min_segment_seconds=3.0, max_segment_seconds=30.0, silence_threshold=0.01):
+        self.fs = fs
+        self.frame_len = int(fs * frame_ms / 1000)
+        self.pause_frames = max(1, int(pause_seconds * 1000 / frame_ms))
+        self.min_samples = int(min_segment_seconds * fs)
+        self.max_samples = int(max_segment_seconds * fs)
+        self.silence_threshold = silence_threshold
+
+        self._frames = []
+        self._samples = 0
+        self._quiet_run = 0
+        self._has_speech = False
+        self._carry = np.zeros(0, dtype=np.float32)
+        self.offset = 0  # start (in samples) of the segment being built
+
+    def feed(self, block):
+        """
+        Add a block of audio (int16 or float32, mono) and return any completed segments
+        as a list of (start_seconds, float32 array) tuples.
+        """
+        block = np.asarray(block).reshape(-1)
+        if block.dtype == np.int16:
+            block = block.astype(np.float32) / 32768.0
+        audio = np.concatenate((self._carry, block.astype(np.float32, copy=False)))
+
+        completed = []
+        n_frames = len(audio) // self.frame_len
+        for i in range(n_frames):
+            frame = audio[i * self.frame_len:(i + 1) * self.frame_len]
+            self._frames.append(frame)
+            self._samples += len(frame)
+
+            rms = float(np.sqrt(np.mean(frame * frame)))
+            if rms < self.silence_threshold:
+                self._quiet_run += 1
+            else:
+                self._quiet_run = 0
+                self._has_speech = True
+
+            at_pause = self._quiet_run >= self.pause_frames and self._samples >= self.min_samples
+            if at_pause or self._samples >= self.max_samples:
+                segment = self._close()
+                if segment is not None:
+                    completed.append(segment)
+
+        self._carry = audio[n_frames * self.frame_len:]
+        return completed
+
+    def flush(self):
+        """Close and return the final partial segment, if it contains speech."""
+        if len(self._carry):
+            self._frames.append(self._carry)
+            self._samples += len(self._carry)
+            self._carry = np.zeros(0, dtype=np.float32)
+        segment = self._close()
+        return [segment] if segment is not None else []
+
+    def _close(self):
+        segment = None
+        if self._frames and self._has_speech:
+            segment = (self.offset / self.fs, np.concatenate(self._frames))
+        self.offset += self._samples
+        self._frames = []
+        self._samples = 0
+        self._quiet_run = 0
+        self._has_speech = False
+        return segment
+
+
+class LiveTranscriber:
+    """
+    Background Whisper worker fed with segments from a PauseSegmenter.
+
+    Segments are transcribed in order on a single worker thread. The language detected on
+    the first segment is pinned for the rest of the session, and the tail of the running
+    transcript is passed as the prompt for the next segment to keep wording consistent.
+    """
+
+    def __init__(self, model_size="small", use_server=False, segmenter=None):
+        self.model_size = model_size
+        self.segmenter = segmenter or PauseSegmenter()
+        self.language = None
+        self.texts = []
+        self.segments = []
+
+        self._client = WhisperServerClient() if use_server else None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="live-whisper", daemon=True)
+
+    def start(self):
+        if self._client is None:
+            # Load before the first segment arrives so it does not queue behind the load
+            get_model(self.model_size)
+        self._thread.start()
+        return self
+
+    def feed(self, block):
+        """Recorder hook: segment the block and queue finished segments."""
+        for segment in self.segmenter.feed(block):
+            self._queue.put(segment)
+
+    def finish(self):
+        """
+        Flush the last segment, wait for the backlog to drain and return the transcript.
+
+        Returns:
+            tuple: (transcribed text, detected language)
+        """
+        for segment in self.segmenter.flush():
+            self._queue.put(segment)
+        self._queue.put(None)
+        self._thread.join()
+        return " ".join(self.texts).strip(), self.language or "en"
+
+    def _transcribe(self, audio, **options):
+        if self._client is not None:
+            return self._client.transcribe(audio, model_size=self.model_size, **options)
+        return get_model(self.model_size).transcribe(audio, **options)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            start, audio = item
+
+            options = {"task": "translate", "language": self.language}
+            if self.texts:
+                options["initial_prompt"] = " ".join(self.texts)[-200:]
+
+            try:
+                result = self._transcribe(audio, **options)
+            except Exception as e:
+                print(f"Warning: Live transcription of segment at {start:.1f}s failed: {e}")
+                continue
+
+            if self.language is None:
+                self.language = result.get("language")
+
+            text = result["text"].strip()
+            if text:
+                self.texts.append(text)
+                print(f"📝 [{start:6.1f}s] {text}")
+            for seg in result.get("segments", []):
+                self.segments.append({**seg, "start": seg["start"] + start, "end": seg["end"] + start})
+
+
+def record_and_transcribe(filename="audio/raw.wav", model_size="small", use_server=False):
+    """
+    Record a consultation and transcribe it live, then run correction and summary.
+
+    Returns:
+        tuple: (cleaned text, clinical summary or None), or None if nothing was recorded.
+    """
+    transcriber = LiveTranscriber(model_size=model_size, use_server=use_server).start()
+
+    recorded = record_audio(filename, fs=WHISPER_SAMPLE_RATE, on_audio=transcriber.feed)
+
+    started = time.monotonic()
+    transcribed_text, detected_lang = transcriber.finish()
+    print(f"⏱️ Transcript ready {time.monotonic() - started:.1f}s after recording stopped")
+
+    if recorded is None or not transcribed_text:
+        print("⚠️ No speech captured.")
+        return None
+
+    return post_process_transcript(transcribed_text, detected_lang)
+
+
+if __name__ == "__main__":
+    record_and_transcribe(use_server="--server" in sys.argv)
@@ -0,0 +1,168 @@
+"""
+Local Normalizer
+Deterministic, offline clean-up of Whisper text: expands medical shorthand from a
+dictionary and respells known names. Used as the correction when Gemini is unavailable.
+"""
+
+import re
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.keyword_automaton import KeywordAutomaton
+from agents.entity_index import EntityIndex
+
+# Expanded wherever they occur. Only abbreviations that mean nothing else in a consultation
+# belong here; "sob" or "dm" ("DM Sharma") are left for Gemini, which sees the context.
+# Longer phrases win over their prefixes ("bp high" before "bp").
+MEDICAL_SHORTHAND = {
+    "bp high": "blood pressure is high",
+    "bp is high": "blood pressure is high",
+    "high bp": "high blood pressure",
+    "bp low": "blood pressure is low",
+    "bp is low": "blood pressure is low",
+    "low bp": "low blood pressure",
+    "bp": "blood pressure",
+    "sugar high": "blood sugar is high",
+    "sugar is high": "blood sugar is high",
+    "sugar low": "blood sugar is low",
+    "c/o": "complains of",
+    "h/o": "history of",
+    "k/c/o": "known case of",
+    "s/p": "status post",
+    "htn": "hypertension",
+    "t2dm": "type 2 diabetes mellitus",
+    "uti": "urinary tract infection",
+    "urti": "upper respiratory tract infection",
+    "gerd": "gastroesophageal reflux disease",
+    "bid": "twice daily",
+    "tds": "three times a day",
+    "tid": "three times a day",
+    "qid": "four times a day",
+    "prn": "as needed",
+    "inj": "injection",
+    "syp": "syrup",
+}
+
+# Ordinary words or initials outside a prescription ("she started to sob", "cap", "OD"), so
+# they are only expanded next to a dose with a unit ("500 mg"), or next to a bare number
+# together with another dose-form or frequency word ("tab dolo 650 bd")
+DOSING_SHORTHAND = {
+    "od": "once daily",
+    "bd": "twice daily",
+    "hs": "at bedtime",
+    "sos": "when required",
+    "tab": "tablet",
+    "tabs": "tablets",
+    "cap": "capsule",
+    "caps": "capsules",
+}
+
+DOSE_RE = re.compile(r"\b\d+(?:\.\d+)?\s*(?:mg|mcg|ml|g|iu|units?)\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+DOSING_CUE_RE = re.compile(
+    r"\b(?:tabs?|tablets?|caps?|capsules?|syp|syrup|inj|injection|drops?|od|bd|bid|tds|tid|qid|hs|sos|"
+    r"prn|once|twice|thrice|daily)\b",
+    re.IGNORECASE,
+)
+CLAUSE_END_RE = re.compile(r"[.;!?]")
+# Standalone lowercase "i", but not the "i" of "i.e." or other dotted abbreviations
+LOWERCASE_I_RE = re.compile(r"(?<![\w.])i\b(?!\.\w)")
+
+
+class LocalNormalizer:
+    def __init__(self, known_entities=None, entity_index=None, shorthand=None, dosing_shorthand=None,
+                 respell_threshold=85, dose_window=24):
+        """
+        Args:
+            known_entities (dict): {label: value} names to respell, as passed to the Gemini
+                pipeline.
+            entity_index (EntityIndex): Optional directory of further names.
+            shorthand (dict): Replacement dictionary (defaults to MEDICAL_SHORTHAND).
+            dosing_shorthand (dict): Replacements applied only near a dose (defaults to
+                DOSING_SHORTHAND).
+            respell_threshold (float): Minimum match score before a name is respelled.
+                Higher than the prompt-injection threshold, as the text is changed directly.
+            dose_window (int): Characters searched for a dose on each side of a dosing
+                abbreviation, within the same clause.
+        """
+        self.shorthand = KeywordAutomaton(shorthand or MEDICAL_SHORTHAND)
+        self.dosing = KeywordAutomaton(dosing_shorthand or DOSING_SHORTHAND)
+        self.dose_window = dose_window
+        self.indexes = []
+        if known_entities:
+            self.indexes.append(EntityIndex(known_entities.items()))
+        if entity_index is not None:
+            self.indexes.append(entity_index)
+        self.respell_threshold = respell_threshold
+        self.last_changes = []
+
+    def normalize(self, text):
+        """
+        Return `text` with known names respelled and shorthand expanded. The individual
+        replacements are kept in `last_changes`.
+        """
+        text = re.sub(r"\s+", " ", text).strip()
+
+        edits = []
+        for index in self.indexes:
+            for start, end, _, value, _ in index.locate(text, threshold=self.respell_threshold):
+                edits.append((start, end, value, "entity"))
+        # A name is never expanded as shorthand
+        shorthand = self.shorthand.find_all(text)
+        shorthand += [m for m in self.dosing.find_all(text) if self._near_dose(text, m[0], m[1])]
+        for start, end, _, value in shorthand:
+            if _in_dotted_abbreviation(text, start, end):
+                continue
+            if not any(s < end and start < e for s, e, _, _ in edits):
+                edits.append((start, end, value, "shorthand"))
+
+        parts = []
+        changes = []
+        last = 0
+        for start, end, value, kind in sorted(edits):
+            if start < last:
+                continue  # the same name found in both the known entities and the directory
+            original = text[start:end]
+            parts.append(text[last:start])
+            parts.append(value)
+            if original != value:
+                changes.append({"from": original, "to": value, "kind": kind})
+            last = end
+        parts.append(text[last:])
+        self.last_changes = changes
+
+        # Standalone lowercase "i" is a common Whisper artefact
+        return LOWERCASE_I_RE.sub("I", "".join(parts))
+
+    def _near_dose(self, text, start, end):
+        """
+        A dose with a unit in the same clause, or a bare number plus another dose-form or
+        frequency word ("1 tab od"). A bare number alone is not enough ("a cap for 2 days").
+        """
+        before = CLAUSE_END_RE.split(text[max(0, start - self.dose_window):start])[-1]
+        after = CLAUSE_END_RE.split(text[end:end + self.dose_window])[0]
+        if DOSE_RE.search(before) or DOSE_RE.search(after):
+            return True
+        return bool((NUMBER_RE.search(before) or NUMBER_RE.search(after))
+                    and (DOSING_CUE_RE.search(before) or DOSING_CUE_RE.search(after)))
+
+
+def _in_dotted_abbreviation(text, start, end):
+    """True if text[start:end] is part of a dotted abbreviation such as "i.e." or "b.p.m"."""
+    return (
+        (start >= 2 and text[start - 1] == "." and text[start - 2].isalpha())
+        or (end + 1 < len(text) and text[end] == "." and text[end + 1].isalpha())
+    )
+
+
+if __name__ == "__main__":
+    # Test
+    normalizer = LocalNormalizer(known_entities={"name": "Aysha Saheera"})
+    test_text = "my name is aisha sahara, c/o fever and bp high. take tab paracetamol 500 mg bd"
+    print(f"Original: {test_text}")
+    print(f"Normalized: {normalizer.normalize(test_text)}")
+    for change in normalizer.last_changes:
+        print(f"  {change['kind']}: {change['from']} -> {change['to']}")
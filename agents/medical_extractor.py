@@ -1,87 +1,283 @@
-import spacy
 import json
 import sys
 import re
 import os
-from spacy.matcher import PhraseMatcher, Matcher
+import time
+import bisect
+import threading
 
-# Load English tokenizer, tagger, parser and NER
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("❌ Error: Model 'en_core_web_sm' not found.")
-    print("Please run: python -m spacy download en_core_web_sm")
-    sys.exit(1)
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def extract_medical_info(text):
-    doc = nlp(text)
-    
-    data = {
-        "diseases": [],
-        "symptoms": [],
-        "medicines": []
-    }
-
-    # ---------------------------------------------------------
-    # 1. Define Knowledge Base (Simple Lists for Demo)
-    # ---------------------------------------------------------
-    # In a real app, load these from a database or ontology (SNOMED/ICD).
-    symptom_list = [
-        "fever", "cough", "headache", "sore throat", "pain", "nausea", 
-        "vomiting", "dizziness", "fatigue", "rash", "chest pain", "cold", "flu"
-    ]
-    
-    disease_list = [
-        "viral fever", "typhoid", "malaria", "diabetes", "hypertension", 
-        "infection", "pneumonia", "migraine"
-    ]
-    
-    medicine_indicators = [
-        "tablet", "syrup", "capsule", "antibiotic", "injection", "cream", 
-        "gel", "drops", "paracetamol", "dolopar", "azithromycin", "crocin"
-    ]
-
-    # ---------------------------------------------------------
-    # 2. Extract Symptoms & Diseases (PhraseMatcher)
-    # ---------------------------------------------------------
-    matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
-    
-    # Add patterns
-    symptom_patterns = [nlp.make_doc(text) for text in symptom_list]
-    disease_patterns = [nlp.make_doc(text) for text in disease_list]
-    
-    matcher.add("SYMPTOM", symptom_patterns)
-    matcher.add("DISEASE", disease_patterns)
-
-    matches = matcher(doc)
-    for match_id, start, end in matches:
-        span = doc[start:end]
-        label = nlp.vocab.strings[match_id]
-        if label == "SYMPTOM":
-            if span.text.lower() not in data["symptoms"]:
-                data["symptoms"].append(span.text.lower())
-        elif label == "DISEASE":
-            if span.text.lower() not in data["diseases"]:
-                data["diseases"].append(span.text.lower())
-
-    # ---------------------------------------------------------
-    # 3. Extract Medicines & Dosage (Custom NER / Rules)
-    # ---------------------------------------------------------
-    # Strategy: Look for sentences containing medicine keywords, 
-    # then extract dosage details from the same sentence.
-    
-    for sent in doc.sents:
-        sent_text_lower = sent.text.lower()
-        
-        # Check if sentence mentions a medicine form or specific name
-        if any(ind in sent_text_lower for ind in medicine_indicators):
-            
-            # Simple extraction strategy: 
-            # 1. Find the medicine name (simplest: match known list or look for Nouns near 'tablet/syrup')
-            # 2. Find dosage (regex for mg, ml)
-            # 3. Find frequency (once daily, twice a day, 1-0-1)
-            # 4. Find duration (for 3 days, 1 week)
-            
+from config.settings import TERMINOLOGY_PATH, FORMULARY_PATH, FORMULARY_SINGLE_WORD_THRESHOLD
+from agents.keyword_automaton import KeywordAutomaton
+
+# ---------------------------------------------------------
+# Knowledge Base (Simple Lists for Demo)
+# ---------------------------------------------------------
+# In a real app, load these from a database or ontology (SNOMED/ICD).
+SYMPTOM_LIST = [
+    "fever", "cough", "headache", "sore throat", "pain", "nausea", 
+    "vomiting", "dizziness", "fatigue", "rash", "chest pain", "cold", "flu"
+]
+
+DISEASE_LIST = [
+    "viral fever", "typhoid", "malaria", "diabetes", "hypertension", 
+    "infection", "pneumonia", "migraine"
+]
+
+MEDICINE_INDICATORS = [
+    "tablet", "syrup", "capsule", "antibiotic", "injection", "cream", 
+    "gel", "drops", "paracetamol", "dolopar", "azithromycin", "crocin"
+]
+
+# Indicators that describe a form or class rather than name a medicine
+MEDICINE_FORMS = {"tablet", "syrup", "capsule", "antibiotic", "injection", "cream", "gel", "drops"}
+
+# Dose forms whose preceding noun is usually the medicine name ("Dolo tablet")
+DOSE_FORMS = {"tablet", "syrup", "capsule", "injection", "tablets", "syrups", "capsules", "injections"}
+
+# Dosage, frequency, timing and duration cues in one pattern, so the whole document is
+# scanned once; the named group that matched tells which field a cue fills.
+MEDICINE_CUE_RE = re.compile(
+    # Dosage (e.g., 500mg, 5 ml)
+    r"\b(?P<dosage>\d+(?:\.\d+)?\s?(?:mg|ml|mcg|g))\b"
+    # Frequency (e.g., twice a day, 1-0-1, every 8 hours)
+    r"|\b(?P<frequency>(?:once|twice|thrice|(?:one|two|three|four|\d+)\s(?:times?))\s(?:a|per|every)\s(?:day|week)"
+    r"|(?:once|twice|thrice)\s(?:daily|weekly)|[0-3]-[0-3]-[0-3]|every\s\d+\s(?:hours|hrs)"
+    r"|three\stimes\sa\sday|four\stimes\sa\sday|as\sneeded|when\srequired)\b"
+    # Timing (e.g., after food, at bedtime)
+    r"|\b(?P<timing>(?:before|after|with)\s(?:food|meals?|breakfast|lunch|dinner)"
+    r"|(?:on\san\s)?empty\sstomach|at\sbedtime|at\snight|in\sthe\s(?:morning|evening))\b"
+    # Duration (e.g., for 5 days)
+    r"|\bfor\s(?P<duration>\d+\s(?:days?|weeks?|months?))\b",
+    re.IGNORECASE,
+)
+
+
+def build_medicine_automaton(names=()):
+    """
+    Keyword automaton over the medicine indicators plus any extra medicine `names`
+    (e.g. a formulary). Values are "form" or "name".
+    """
+    automaton = KeywordAutomaton()
+    for word in [*MEDICINE_INDICATORS, *names]:
+        kind = "form" if word in MEDICINE_FORMS else "name"
+        automaton.add(word, kind)
+        if kind == "form" and not word.endswith("s"):
+            automaton.add(word + "s", kind)
+    return automaton
+
+
+class MedicalExtractor:
+    """
+    Reusable extractor. The spaCy model is loaded on first use, and the phrase matcher
+    is compiled once, so each call costs only the nlp(text) pass.
+    """
+
+    def __init__(self, model="en_core_web_sm", disable=("ner", "lemmatizer"), terminology=TERMINOLOGY_PATH,
+                 medicine_names=(), formulary=FORMULARY_PATH):
+        """
+        Args:
+            model (str): spaCy pipeline to load.
+            disable (tuple): Pipes the extractor does not use. The tagger (for POS) and
+                the parser (for sentences) must stay enabled.
+            terminology (str): Optional terminology file (see agents/terminology.py). Its
+                symptoms and diseases are matched alongside the built-in lists, and every
+                match is reported with its code under "concepts".
+            medicine_names (iterable): Extra medicine names to detect besides
+                MEDICINE_INDICATORS.
+            formulary (str or FormularyIndex): Optional formulary. Misheard medicine
+                names are resolved against it, sentences with a dosage or frequency but no
+                known keyword are checked too, and each medicine gets "canonical_name",
+                "generic_name" and "match_score".
+        """
+        self.model = model
+        self.disable = list(disable)
+        self.terminology = terminology
+        self.formulary = formulary
+        self._formulary = None
+        self._nlp = None
+        self._matcher = None
+        self._terminology = None
+        self._medicines = build_medicine_automaton(medicine_names)
+        self._lock = threading.Lock()
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._load()
+        return self._nlp
+
+    def _load(self):
+        with self._lock:
+            if self._nlp is not None:
+                return
+            # Imported here so that importing this module stays cheap
+            import spacy
+            from spacy.matcher import PhraseMatcher
+
+            try:
+                nlp = spacy.load(self.model, disable=self.disable)
+            except OSError as e:
+                raise OSError(
+                    f"Model '{self.model}' not found. "
+                    f"Please run: python -m spacy download {self.model}"
+                ) from e
+
+            matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+            matcher.add("SYMPTOM", list(nlp.tokenizer.pipe(SYMPTOM_LIST)))
+            matcher.add("DISEASE", list(nlp.tokenizer.pipe(DISEASE_LIST)))
+
+            if self.terminology:
+                from agents.terminology import TerminologyMatcher
+                self._terminology = TerminologyMatcher.load(nlp, self.terminology)
+
+            if isinstance(self.formulary, str) and self.formulary:
+                from agents.formulary import FormularyIndex
+                self._formulary = FormularyIndex.from_file(self.formulary)
+            elif self.formulary:
+                self._formulary = self.formulary
+
+            self._matcher = matcher
+            self._nlp = nlp
+
+    def extract(self, text):
+        if len(text) > self.nlp.max_length:
+            # Too long for a single Doc; process it in sentence windows instead
+            merger = ExtractionMerger()
+            for data in self.extract_stream([text], window_chars=min(20000, self.nlp.max_length // 2)):
+                merger.add(data)
+            return merger.result()
+        return self.extract_doc(self.nlp(text))
+
+    def extract_stream(self, chunks, window_chars=20000, batch_size=4):
+        """
+        Extract from a transcript of any length in bounded sentence windows.
+
+        Args:
+            chunks (iterable): Pieces of text, e.g. fixed-size reads from an open file.
+            window_chars (int): Approximate window size; windows end at a sentence
+                boundary, so memory stays flat however long the input is.
+            batch_size (int): Windows per spaCy batch.
+
+        Yields:
+            dict: Partial result for each window, in order. Combine them with
+                ExtractionMerger.
+        """
+        windows = iter_sentence_windows(chunks, window_chars)
+        for doc in self.nlp.pipe(windows, batch_size=batch_size):
+            yield self.extract_doc(doc)
+
+    def extract_batch(self, records, batch_size=64, n_process=1):
+        """
+        Extract from many transcripts with nlp.pipe.
+
+        Args:
+            records (iterable): (id, text) pairs; consumed lazily.
+            batch_size (int): Texts per spaCy batch.
+            n_process (int): Worker processes for the spaCy pipeline.
+
+        Transcripts longer than `nlp.max_length`, which nlp.pipe would reject and so abort
+        the whole batch, are extracted in sentence windows instead (see `extract`). If that
+        fails too, the record's data is {"error": message} and the batch carries on.
+
+        Yields:
+            tuple: (id, data) in input order.
+        """
+        max_length = self.nlp.max_length
+
+        def routed():
+            for rid, text in records:
+                if len(text) > max_length:
+                    # A placeholder keeps the record's place in the pipe's output order
+                    yield "", (rid, text)
+                else:
+                    yield text, (rid, None)
+
+        docs = self.nlp.pipe(routed(), as_tuples=True, batch_size=batch_size, n_process=n_process)
+        for doc, (rid, oversized) in docs:
+            if oversized is None:
+                yield rid, self.extract_doc(doc)
+                continue
+            try:
+                yield rid, self.extract(oversized)
+            except Exception as e:
+                print(f"⚠️ Transcript {rid}: extraction failed: {e}")
+                yield rid, {"error": str(e)}
+
+    def extract_doc(self, doc):
+        """Extract from an already processed Doc (e.g. one yielded by nlp.pipe)."""
+        # Dicts keep first-seen order and make each de-duplication check O(1)
+        found = {"diseases": {}, "symptoms": {}}
+
+        # ---------------------------------------------------------
+        # 1. Extract Symptoms & Diseases (PhraseMatcher)
+        # ---------------------------------------------------------
+        strings = doc.vocab.strings
+        for match_id, start, end in self._matcher(doc):
+            label = strings[match_id]
+            if label == "SYMPTOM":
+                found["symptoms"].setdefault(doc[start:end].text.lower())
+            elif label == "DISEASE":
+                found["diseases"].setdefault(doc[start:end].text.lower())
+
+        concepts = None
+        if self._terminology is not None:
+            concepts = {}
+            for concept in self._terminology(doc):
+                concepts.setdefault((concept["code"], concept["text"]),
+                                    {k: concept[k] for k in ("text", "code", "term", "label", "system")})
+                field = {"SYMPTOM": "symptoms", "DISEASE": "diseases"}.get(concept["label"])
+                if field:
+                    found[field].setdefault(concept["text"])
+
+        data = {
+            "diseases": list(found["diseases"]),
+            "symptoms": list(found["symptoms"]),
+            "medicines": []
+        }
+        if concepts is not None:
+            data["concepts"] = list(concepts.values())
+
+        # ---------------------------------------------------------
+        # 2. Extract Medicines & Dosage (Custom NER / Rules)
+        # ---------------------------------------------------------
+        # Strategy: One pass over the document finds every medicine keyword and every
+        # dosage/frequency/timing/duration cue; both are bucketed into sentences, and
+        # sentences that mention a medicine become entries.
+        data["medicines"] = self._extract_medicines(doc)
+
+        return data
+
+    def _extract_medicines(self, doc):
+        sents = list(doc.sents)
+        sent_starts = [sent.start_char for sent in sents]
+        text = doc.text
+
+        keywords = {}
+        for start, end, keyword, kind in self._medicines.find_all(text):
+            idx = bisect.bisect_right(sent_starts, start) - 1
+            keywords.setdefault(idx, []).append((start, end, keyword, kind))
+
+        cues = {}
+        cue_starts = {}
+        for match in MEDICINE_CUE_RE.finditer(text):
+            idx = bisect.bisect_right(sent_starts, match.start()) - 1
+            # Keep the first cue of each kind in the sentence
+            cues.setdefault(idx, {}).setdefault(match.lastgroup, match.group(match.lastgroup))
+            if match.lastgroup in ("dosage", "frequency"):
+                cue_starts.setdefault(idx, set()).add(match.start())
+
+        candidates = set(keywords)
+        if self._formulary is not None:
+            # A misheard name ("azithromicin 500mg") matches no keyword, but its dosage does
+            candidates.update(idx for idx, found in cues.items() if "dosage" in found or "frequency" in found)
+
+        medicines = []
+        for idx in sorted(candidates):
+            sent = sents[idx]
+            found = keywords.get(idx, [])
             med_entry = {
                 "name": "",
                 "dosage": "",
@@ -90,37 +286,271 @@ def extract_medical_info(text):
                 "duration": "",
                 "source": "auto_extracted"
             }
-            
-            # Extract Dosage (e.g., 500mg, 5 ml)
-            dosage_pattern = re.search(r"(\d+\s?(?:mg|ml|g|mcg))", sent.text, re.IGNORECASE)
-            if dosage_pattern:
-                med_entry["dosage"] = dosage_pattern.group(1)
-
-            # Extract Duration (e.g., for 5 days)
-            duration_pattern = re.search(r"(?:for\s)(\d+\s(?:days|weeks))", sent.text, re.IGNORECASE)
-            if duration_pattern:
-                med_entry["duration"] = duration_pattern.group(1)
-
-            # Identify Medicine Name (Heuristic: Look for Proper Nouns or Nouns around keywords)
-            # For this demo, we'll try to match from our indicator list + context
-            matching_meds = [m for m in medicine_indicators if m in sent_text_lower]
-            if matching_meds:
-                # Pick the most specific one or combine (e.g., "paracetamol tablet")
-                # Here we just take the first matched keyword as a safe fallback
-                med_entry["name"] = matching_meds[0] 
-                
-                # Try to find a Proper Noun preceding "tablet" or "syrup"
-                for i, token in enumerate(sent):
-                    if token.text.lower() in ["tablet", "syrup", "capsule", "injection"]:
-                        # Look at previous token
-                        if i > 0 and (sent[i-1].pos_ == "PROPN" or sent[i-1].pos_ == "NOUN"):
-                             med_entry["name"] = f"{sent[i-1].text} {token.text}"
-
-            # Only add if we found a potential medicine
-            if med_entry["name"]:
-                data["medicines"].append(med_entry)
-
-    return data
+            med_entry.update(cues.get(idx, {}))
+
+            # Identify Medicine Name: prefer a named medicine over a form keyword, then
+            # try to find a Proper Noun or Noun preceding "tablet" or "syrup"
+            names = [text[s:e] for s, e, _, kind in found if kind == "name"]
+            if found:
+                med_entry["name"] = (names or [text[found[0][0]:found[0][1]]])[0].lower()
+            for start, end, keyword, _ in found:
+                if keyword not in DOSE_FORMS:
+                    continue
+                span = doc.char_span(start, end, alignment_mode="expand")
+                token = span[0]
+                if token.i > sent.start and doc[token.i - 1].pos_ in ("PROPN", "NOUN"):
+                    med_entry["name"] = f"{doc[token.i - 1].text} {span.text}"
+
+            if self._formulary is not None:
+                resolved = self._resolve_in_formulary(sent, names, cue_starts.get(idx, ()))
+                if resolved is None and not found:
+                    continue
+                heard, formulary_name, generic, score = resolved or ("", "", "", 0.0)
+                if heard and not names:
+                    med_entry["name"] = heard
+                med_entry["canonical_name"] = formulary_name
+                med_entry["generic_name"] = generic
+                med_entry["match_score"] = score
+
+            medicines.append(med_entry)
+        return medicines
+
+    def _resolve_in_formulary(self, sent, names, cue_starts=()):
+        """
+        Look up the sentence's candidate medicine names in the formulary: keyword hits,
+        then nouns, the word right before a dosage or frequency cue and the word right
+        after a dose form ("tab azithromicin"), alone or paired with the next word
+        ("dolo par"). Single words need FORMULARY_SINGLE_WORD_THRESHOLD.
+
+        Returns:
+            tuple: (heard text, formulary name, generic name, score) or None.
+        """
+        def is_word(token):
+            return (token.is_alpha and not token.is_stop and token.lower_ not in MEDICINE_FORMS
+                    and token.lower_ not in DOSE_FORMS)
+
+        tagged = sent.doc.has_annotation("POS")
+        words = {t.i: t for t in sent if is_word(t) and tagged and t.pos_ in ("NOUN", "PROPN")}
+        for token in sent:
+            if token.idx in cue_starts:
+                # Two words back, so "dolo" in "dolo par 650" also starts a pair
+                before = [t for t in sent[:token.i - sent.start][-2:] if is_word(t)]
+                words.update((t.i, t) for t in before)
+            elif token.lower_ in MEDICINE_FORMS or token.lower_ in DOSE_FORMS:
+                if token.i + 1 < sent.end and is_word(token.nbor()):
+                    words[token.i + 1] = token.nbor()
+
+        phrases = [(name, None) for name in names]
+        for _, token in sorted(words.items()):
+            phrases.append((token.text, FORMULARY_SINGLE_WORD_THRESHOLD))
+            nxt = token.nbor() if token.i + 1 < sent.end else None
+            if nxt is not None and (nxt.like_num or (nxt.is_alpha and not nxt.is_stop)):
+                phrases.append((f"{token.text} {nxt.text}", None))
+
+        thresholds = {}
+        for phrase, threshold in phrases:
+            thresholds.setdefault(phrase.lower(), threshold)
+
+        best = None
+        for phrase, threshold in thresholds.items():
+            match = self._formulary.lookup(phrase)
+            if match is not None and threshold is not None and match[2] < threshold:
+                match = None
+            if match is not None and (best is None or (match[2], len(phrase)) > (best[3], len(best[0]))):
+                best = (phrase, *match)
+                if match[2] == 100.0 and phrase in (n.lower() for n in names):
+                    break
+        return best
+
+
+class ExtractionMerger:
+    """Combines per-window results, de-duplicating diseases, symptoms and concepts."""
+
+    def __init__(self):
+        self.diseases = {}
+        self.symptoms = {}
+        self.medicines = []
+        self.concepts = None
+        self.windows = 0
+
+    def add(self, data):
+        self.windows += 1
+        for item in data["diseases"]:
+            self.diseases.setdefault(item)
+        for item in data["symptoms"]:
+            self.symptoms.setdefault(item)
+        self.medicines.extend(data["medicines"])
+        if "concepts" in data:
+            if self.concepts is None:
+                self.concepts = {}
+            for concept in data["concepts"]:
+                self.concepts.setdefault((concept["code"], concept["text"]), concept)
+
+    def result(self):
+        data = {
+            "diseases": list(self.diseases),
+            "symptoms": list(self.symptoms),
+            "medicines": list(self.medicines)
+        }
+        if self.concepts is not None:
+            data["concepts"] = list(self.concepts.values())
+        return data
+
+
+# Sentence end followed by whitespace (closing quotes/brackets allowed)
+SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s+")
+
+
+def iter_sentence_windows(chunks, window_chars=20000):
+    """
+    Re-cut a stream of text pieces into windows of about `window_chars` that end at a
+    sentence boundary (or at whitespace, for unpunctuated runs).
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        # Walk an offset rather than re-slicing, so one huge chunk is not copied per window
+        pos = 0
+        while len(buffer) - pos >= window_chars:
+            limit = pos + window_chars
+            cut = None
+            for match in SENTENCE_END_RE.finditer(buffer, pos, limit):
+                cut = match.end()
+            if cut is None:
+                space = buffer.rfind(" ", pos, limit)
+                cut = space + 1 if space > pos else limit
+            window = buffer[pos:cut]
+            pos = cut
+            if window.strip():
+                yield window
+        buffer = buffer[pos:]
+    if buffer.strip():
+        yield buffer
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_extractor():
+    """Process-wide extractor, so the model and matchers are loaded once."""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = MedicalExtractor()
+        return _extractor
+
+
+def extract_medical_info(text):
+    return get_extractor().extract(text)
+
+def iter_transcripts(source):
+    """
+    Yield (id, text) pairs from a directory of .txt transcripts (searched recursively,
+    id = relative path) or a JSONL file with a "text" field per line (id = its "id"
+    field, or the line number).
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".txt"):
+                    path = os.path.join(root, name)
+                    with open(path, "r", encoding="utf-8") as f:
+                        yield os.path.relpath(path, source), f.read()
+        return
+
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Skipping line {line_no}: {e}")
+                continue
+            yield record.get("id", line_no), record.get("text") or ""
+
+
+def run_batch(source, output_file, batch_size=64, n_process=1, report_every=500):
+    """
+    Re-extract a whole archive, writing one JSON object per transcript (NDJSON) as
+    results arrive. Progress and throughput are printed every `report_every` transcripts.
+    A transcript that cannot be extracted gets an {"id", "error"} line instead.
+
+    Returns:
+        dict: {"transcripts", "errors", "chars", "seconds", "per_second"}
+    """
+    extractor = get_extractor()
+    stats = {"transcripts": 0, "errors": 0, "chars": 0}
+
+    def counted(records):
+        for rid, text in records:
+            stats["chars"] += len(text)
+            yield rid, text
+
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    with open(output_file, "w", encoding="utf-8") as out:
+        for rid, data in extractor.extract_batch(counted(iter_transcripts(source)),
+                                                 batch_size=batch_size, n_process=n_process):
+            out.write(json.dumps({"id": rid, **data}, ensure_ascii=False) + "\n")
+            stats["transcripts"] += 1
+            stats["errors"] += "error" in data
+            if stats["transcripts"] % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"⏳ {stats['transcripts']} transcripts, "
+                      f"{stats['transcripts'] / elapsed:.1f}/s, {stats['chars'] / elapsed / 1000:.0f}k chars/s",
+                      flush=True)
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["per_second"] = round(stats["transcripts"] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def run_stream(input_file, output_file, window_chars=20000, save_every=10):
+    """
+    Extract from a very long transcript window by window. The file is read in blocks of
+    `window_chars`, so memory stays bounded even when the transcript is a single line.
+    The merged result so far is written to `output_file` every `save_every` windows and
+    at the end, so partial results are available early without rewriting the whole
+    result after each window.
+
+    Returns:
+        dict: The merged extraction.
+    """
+    merger = ExtractionMerger()
+    start = time.perf_counter()
+
+    def save():
+        with open(output_file, "w", encoding="utf-8") as out:
+            json.dump(merger.result(), out, indent=2)
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        try:
+            blocks = iter(lambda: f.read(window_chars), "")
+            for data in get_extractor().extract_stream(blocks, window_chars=window_chars):
+                merger.add(data)
+                if merger.windows % save_every == 0:
+                    save()
+                print(f"⏳ Window {merger.windows}: {len(merger.symptoms)} symptoms, "
+                      f"{len(merger.diseases)} diseases, {len(merger.medicines)} medicines "
+                      f"({time.perf_counter() - start:.1f}s)", flush=True)
+            save()
+        except OSError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+
+    info = merger.result()
+    print("\n✅ Extraction Complete:")
+    print(json.dumps(info, indent=2))
+    print(f"\n💾 Saved to '{output_file}'")
+    return info
+
 
 def main():
     # Determine project root
@@ -131,12 +561,51 @@ def main():
     if not os.path.exists(TRANSCRIPTIONS_DIR):
          os.makedirs(TRANSCRIPTIONS_DIR, exist_ok=True)
 
-    input_file = os.path.join(TRANSCRIPTIONS_DIR, "transcription_output.txt")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract diseases, symptoms and medicines from transcripts")
+    parser.add_argument("input_file", nargs="?",
+                        default=os.path.join(TRANSCRIPTIONS_DIR, "transcription_output.txt"))
+    parser.add_argument("--batch", metavar="SOURCE", default=None,
+                        help="Directory of .txt transcripts or a JSONL file with a 'text' field")
+    parser.add_argument("--output", default=None,
+                        help="With --batch, NDJSON output file (default: transcriptions/batch_medical_data.ndjson)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per spaCy batch")
+    parser.add_argument("--n-process", type=int, default=1, help="spaCy worker processes")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read input_file in sentence windows and save partial results as they arrive")
+    parser.add_argument("--window-chars", type=int, default=20000, help="With --stream, characters per window")
+    parser.add_argument("--save-every", type=int, default=10,
+                        help="With --stream, windows between saves of the partial result")
+    args = parser.parse_args()
+
+    if args.batch:
+        output_file = args.output or os.path.join(TRANSCRIPTIONS_DIR, "batch_medical_data.ndjson")
+        if not os.path.exists(args.batch):
+            print(f"❌ Not found: {args.batch}")
+            sys.exit(1)
+        print(f"📚 Batch extraction from: {args.batch}")
+        try:
+            stats = run_batch(args.batch, output_file, batch_size=args.batch_size, n_process=args.n_process)
+        except OSError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        print(f"\n✅ {stats['transcripts']} transcripts in {stats['seconds']}s ({stats['per_second']}/s)")
+        if stats["errors"]:
+            print(f"⚠️ {stats['errors']} transcript(s) could not be extracted; see their \"error\" field")
+        print(f"💾 Saved to '{output_file}'")
+        return
+
+    input_file = args.input_file
     output_file = os.path.join(TRANSCRIPTIONS_DIR, "medical_data.json")
-    
-    # Allow command line arg for file
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
+
+    if args.stream:
+        if not os.path.exists(input_file):
+            print(f"❌ File not found: {input_file}")
+            sys.exit(1)
+        print(f"📄 Streaming from: {input_file}")
+        run_stream(input_file, output_file, window_chars=args.window_chars, save_every=args.save_every)
+        return
 
     print(f"📄 Reading from: {input_file}")
     
@@ -148,7 +617,11 @@ def main():
         sys.exit(1)
 
     print("🧩 Extracting medical info...")
-    info = extract_medical_info(text)
+    try:
+        info = extract_medical_info(text)
+    except OSError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
     
     output_json = json.dumps(info, indent=2)
     print("\n✅ Extraction Complete:")
@@ -0,0 +1,148 @@
+"""
+Noise Profile Store
+Learns a stationary noise profile per consult room or microphone, keeps it on disk and
+reuses it across sessions. A profile holds the per-frequency gating threshold, so a cached
+room is denoised without re-estimating or re-analysing its noise. Profiles are refreshed
+when they expire or when a periodic check finds that the room's noise has drifted.
+"""
+
+import os
+import re
+import sys
+import time
+import numpy as np
+from scipy.signal import stft
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import (
+    NOISE_PROFILE_DIR,
+    NOISE_PROFILE_MAX_AGE_DAYS,
+    NOISE_PROFILE_DRIFT_DB,
+    NOISE_PROFILE_CHECK_HOURS,
+)
+
+N_FFT = 1024
+HOP_LENGTH = N_FFT // 4
+# Bins more than this many standard deviations above the mean noise level count as signal
+N_STD_THRESH = 1.5
+
+
+def amp_to_db(x, top_db=80.0):
+    """Magnitude in dB, floored `top_db` below the loudest frame of each frequency."""
+    x_db = 20 * np.log10(np.abs(x) + np.finfo(np.float64).eps)
+    return np.maximum(x_db, np.max(x_db, axis=-1, keepdims=True) - top_db)
+
+
+def stft_frames(audio, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    return stft(audio, nfft=n_fft, nperseg=n_fft, noverlap=n_fft - hop_length, padded=False)[2]
+
+
+def noise_spectrum(clip, n_fft=N_FFT):
+    """Mean magnitude spectrum of a noise clip, in dB."""
+    n_frames = len(clip) // n_fft
+    if n_frames == 0:
+        clip = np.pad(clip, (0, n_fft - len(clip)))
+        n_frames = 1
+    frames = clip[:n_frames * n_fft].reshape(n_frames, n_fft) * np.hanning(n_fft)
+    magnitude = np.abs(np.fft.rfft(frames, axis=1)).mean(axis=0)
+    return 20 * np.log10(magnitude + 1e-10)
+
+
+def noise_threshold(clip, n_std=N_STD_THRESH):
+    """
+    Per-frequency gating threshold (dB) of a noise clip: mean plus `n_std` standard
+    deviations of its STFT, as in stationary spectral gating.
+    """
+    noise_db = amp_to_db(stft_frames(np.asarray(clip, dtype=np.float32)))
+    return noise_db.mean(axis=1) + n_std * noise_db.std(axis=1)
+
+
+class NoiseProfileStore:
+    def __init__(self, directory=NOISE_PROFILE_DIR, max_age_days=NOISE_PROFILE_MAX_AGE_DAYS,
+                 drift_db=NOISE_PROFILE_DRIFT_DB, check_hours=NOISE_PROFILE_CHECK_HOURS):
+        """
+        Args:
+            directory (str): Where profiles are stored (one .npz file per name).
+            max_age_days (float): Profiles older than this are re-learned.
+            drift_db (float): Mean spectral difference that counts as drift.
+            check_hours (float): How often a cached profile is compared against the noise
+                of a new recording; 0 checks every recording.
+        """
+        self.directory = directory
+        self.max_age = max_age_days * 24 * 3600
+        self.drift_db = drift_db
+        self.check_interval = check_hours * 3600
+
+    def _path(self, name):
+        safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", name.strip()) or "default"
+        return os.path.join(self.directory, f"{safe}.npz")
+
+    def load(self, name):
+        """Return the stored profile for `name`, or None."""
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            profile = {
+                "clip": data["clip"],
+                "sr": int(data["sr"]),
+                "created_at": float(data["created_at"]),
+                "spectrum": data["spectrum"],
+                "threshold": data["threshold"] if "threshold" in data else None,
+            }
+        if profile["threshold"] is None:
+            # Written before thresholds were stored
+            profile["threshold"] = noise_threshold(profile["clip"])
+        # The file's mtime records when the profile was last checked for drift
+        profile["checked_at"] = os.path.getmtime(path)
+        return profile
+
+    def save(self, name, clip, sr):
+        os.makedirs(self.directory, exist_ok=True)
+        profile = {
+            "clip": np.asarray(clip, dtype=np.float32),
+            "sr": sr,
+            "created_at": time.time(),
+            "spectrum": noise_spectrum(clip),
+            "threshold": noise_threshold(clip),
+        }
+        np.savez(self._path(name), **profile)
+        profile["checked_at"] = profile["created_at"]
+        return profile
+
+    def drift(self, profile, clip):
+        """Mean absolute difference (dB) between the stored and a fresh noise spectrum."""
+        return float(np.mean(np.abs(noise_spectrum(clip) - profile["spectrum"])))
+
+    def resolve(self, name, sr, estimate):
+        """
+        Pick the noise profile to use for a recording made in room/device `name`.
+
+        `estimate` is called (without arguments) to get a noise clip from the current
+        recording only when it is needed: there is no usable profile yet, the profile has
+        expired, or it is due for a drift check. A profile checked within the last
+        `check_hours` is reused as is.
+
+        Returns:
+            tuple: (profile dict with "threshold", status) where status is "cached",
+                "checked", "learned", "expired" or "drift".
+        """
+        profile = self.load(name)
+        now = time.time()
+        if profile is None or profile["sr"] != sr:
+            status = "learned"
+        elif now - profile["created_at"] > self.max_age:
+            status = "expired"
+        elif now - profile["checked_at"] < self.check_interval:
+            return profile, "cached"
+        else:
+            candidate_clip = estimate()
+            if self.drift(profile, candidate_clip) <= self.drift_db:
+                os.utime(self._path(name))
+                profile["checked_at"] = now
+                return profile, "checked"
+            return self.save(name, candidate_clip, sr), "drift"
+
+        return self.save(name, estimate(), sr), status
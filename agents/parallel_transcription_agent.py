@@ -0,0 +1,143 @@
+"""
+Parallel Transcription Agent
+Splits long recordings at silence boundaries and decodes the chunks concurrently on a
+process pool, where every worker keeps its own resident Whisper model.
+"""
+
+import whisper
+import os
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.vad_agent import detect_speech_regions
+
+WHISPER_SAMPLE_RATE = 16000
+
+# Model held by each pool worker (set in _init_worker)
+_worker_model = None
+
+
+def _quietest_point(audio, start, end, sr=WHISPER_SAMPLE_RATE, frame_ms=30):
+    """Start of the lowest-energy frame in audio[start:end]."""
+    frame_len = max(1, int(sr * frame_ms / 1000))
+    n_frames = (end - start) // frame_len
+    if n_frames == 0:
+        return end
+    frames = np.asarray(audio[start:start + n_frames * frame_len], dtype=np.float32).reshape(n_frames, frame_len)
+    return start + int(np.argmin(np.mean(frames * frames, axis=1))) * frame_len
+
+
+def split_at_silence(audio, sr=WHISPER_SAMPLE_RATE, target_seconds=60, max_seconds=120, cuts=None):
+    """
+    Split audio into chunks of roughly `target_seconds`, cutting only in gaps between
+    speech regions. A stretch longer than `max_seconds` without a gap is cut at its
+    quietest frame in the last quarter of the window.
+
+    Args:
+        cuts (list): Candidate cut points in samples. Audio already trimmed by the VAD has
+            almost no silence left, so pass the joins of its TimestampMap; when omitted,
+            gaps are detected in `audio` itself.
+
+    Returns:
+        list: (start_sample, end_sample) tuples covering the whole input.
+    """
+    if len(audio) == 0:
+        return []
+
+    target = int(target_seconds * sr)
+    limit = int(max_seconds * sr)
+
+    if cuts is None:
+        # Candidate cut points: the middle of every gap between speech regions
+        regions = detect_speech_regions(audio, sr=sr)
+        cuts = [(prev_end + start) // 2 for (_, prev_end), (start, _) in zip(regions, regions[1:])]
+    cuts = sorted(c for c in cuts if 0 < c < len(audio))
+
+    bounds = []
+    chunk_start = 0
+    for cut in cuts + [len(audio)]:
+        while cut - chunk_start > limit:
+            hard_cut = _quietest_point(audio, chunk_start + limit * 3 // 4, chunk_start + limit, sr)
+            bounds.append((chunk_start, hard_cut))
+            chunk_start = hard_cut
+        if cut - chunk_start >= target or cut == len(audio):
+            bounds.append((chunk_start, cut))
+            chunk_start = cut
+    return [(s, e) for s, e in bounds if e > s]
+
+
+def _init_worker(model_size, threads):
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_size)
+
+
+def _detect_language(audio):
+    audio = whisper.pad_or_trim(audio)
+    mel = whisper.log_mel_spectrogram(audio, n_mels=_worker_model.dims.n_mels).to(_worker_model.device)
+    _, probs = _worker_model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def _transcribe_chunk(audio, options):
+    result = _worker_model.transcribe(audio, **options)
+    return {"text": result["text"], "segments": result["segments"], "language": result.get("language")}
+
+
+def transcribe_parallel(audio, model_size="small", workers=None, task="translate",
+                        target_seconds=60, cuts=None):
+    """
+    Transcribe a long recording with several Whisper processes.
+
+    The language is detected on the first chunk and pinned for every chunk, then all
+    chunks are decoded concurrently and stitched back together in order with segment
+    times shifted to the full-recording timeline.
+
+    Args:
+        audio (str | np.ndarray): Path to an audio file or 16kHz float32 samples.
+        model_size (str): Whisper model size loaded by each worker. Every worker holds
+            its own copy, so size the pool to the available memory.
+        workers (int): Number of worker processes (defaults to the CPU count).
+        task (str): Whisper task, "translate" or "transcribe".
+        target_seconds (float): Preferred chunk length.
+        cuts (list): Candidate cut points in samples, e.g. TimestampMap.joins() for audio
+            already trimmed by the VAD (see split_at_silence).
+
+    Returns:
+        dict: Whisper-style result with "text", "segments" and "language".
+    """
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+
+    bounds = split_at_silence(audio, target_seconds=target_seconds, cuts=cuts)
+    if not bounds:
+        return {"text": "", "segments": [], "language": "en"}
+
+    workers = min(workers or os.cpu_count() or 1, len(bounds))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"⚡ Transcribing {len(bounds)} chunks on {workers} workers ({threads} threads each)...")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_size, threads)) as pool:
+        first_start, first_end = bounds[0]
+        language = pool.submit(_detect_language, audio[first_start:first_end]).result()
+        print(f"🌐 Detected language: {language}")
+
+        options = {"task": task, "language": language}
+        futures = [pool.submit(_transcribe_chunk, audio[s:e], options) for s, e in bounds]
+        results = [f.result() for f in futures]
+
+    segments = []
+    for (start, _), result in zip(bounds, results):
+        offset = start / WHISPER_SAMPLE_RATE
+        for seg in result["segments"]:
+            segments.append({**seg, "id": len(segments), "start": seg["start"] + offset,
+                             "end": seg["end"] + offset})
+
+    text = " ".join(r["text"].strip() for r in results if r["text"].strip())
+    return {"text": text, "segments": segments, "language": language}
@@ -3,49 +3,186 @@ PostWhisperAccuracyPipeline (Gemini Edition)
 Cleans, translates, and normalizes Whisper transcriptions using Gemini 2.0 Flash.
 """
 
-from google import genai
+import re
 import sys
 import os
 import time
+from concurrent.futures import wait
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import GEMINI_API_KEY
+from agents.gemini_cache import get_default_cache
+from agents.gemini_gateway import get_gateway, PRIORITY_HIGH, CircuitOpenError, DeadlineExceeded
+from agents.local_normalizer import LocalNormalizer
 
 class PostWhisperAccuracyPipeline:
-    def __init__(self, known_entities=None):
+    # Bump whenever the prompt template changes so cached corrections are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, known_entities=None, cache=None, use_cache=True, entity_index=None, local_fallback=True):
         """
         known_entities example:
         {
             "name": "Aysha Saheera",
             "college": "KMCT Institute of Emerging Technology and Management"
         }
+
+        entity_index: Optional EntityIndex over a large entity directory. Only the entries
+            that plausibly occur in a transcript are added to known_entities for that call.
+        local_fallback: When Gemini is unavailable, return the text with shorthand expanded
+            and known names respelled locally instead of the raw Whisper output. Gemini
+            always receives the raw text, so the local rules never feed into its context.
+        cache: GeminiResponseCache to use (defaults to the shared on-disk cache).
+        use_cache: Set to False to always call Gemini.
         """
         if not GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is missing from configuration.")
         
-        # Initialize the new GenAI Client
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
+        # Shared client, rate limiter and retry scheduler for all Gemini agents
+        self.gateway = get_gateway()
         
         # Using gemini-flash-latest alias
         self.model_id = "gemini-flash-latest" 
         self.known_entities = known_entities or {}
+        self.entity_index = entity_index
+        self.normalizer = LocalNormalizer(self.known_entities, entity_index)
+        self.local_fallback = local_fallback
+        self.cache = (cache or get_default_cache()) if use_cache else None
 
-    def process(self, whisper_text, detected_language):
+    def process(self, whisper_text, detected_language, chunked=None, max_chunk_tokens=600):
         """
         Processes raw transcription text through Gemini for:
         - Translation to English (if not already)
         - Grammar and spelling correction
         - Medical term normalization
         - Proper noun protection (using known_entities)
+
+        Long transcripts are corrected in parallel chunks (see process_chunked). Pass
+        chunked=True/False to force either mode; by default chunking kicks in once the
+        text is larger than two chunks.
         """
         if not whisper_text:
             return ""
 
-        entities_context = "\n".join([f"- {k}: {v}" for k, v in self.known_entities.items()])
+        if chunked is None:
+            chunked = estimate_tokens(whisper_text) > 2 * max_chunk_tokens
+        if chunked:
+            return self.process_chunked(whisper_text, detected_language, max_chunk_tokens=max_chunk_tokens)
+
+        entities = self._entities_for(whisper_text)
+        cached = self._cached(whisper_text, detected_language, entities)
+        if cached is not None:
+            print("⚡ Using cached accuracy correction.")
+            return cached
+
+        try:
+            # Correction blocks everything downstream, so it jumps the queue
+            response = self.gateway.generate(self._build_prompt(whisper_text, entities), model=self.model_id,
+                                             priority=PRIORITY_HIGH)
+            return self._store(whisper_text, detected_language, response, entities)
+        except CircuitOpenError:
+            # Gemini has been failing repeatedly; don't wait through retries
+            print("Warning: Gemini circuit is open, using local normalization only.")
+            return self._local_fallback(whisper_text)
+        except Exception as e:
+            print(f"Warning: Gemini-based accuracy pipeline failed: {e}")
+            # Fallback to the local normalizer if API fails
+            return self._local_fallback(whisper_text)
+
+    def process_chunked(self, whisper_text, detected_language, max_chunk_tokens=600,
+                        overlap_sentences=1, max_attempts=2):
+        """
+        Corrects a long transcript as independent chunks sent concurrently.
+
+        The text is split at sentence boundaries into chunks of about `max_chunk_tokens`.
+        Each chunk carries the last `overlap_sentences` of the previous chunk as read-only
+        context. Results are stitched back in the original order; only chunks that failed
+        are resubmitted, and a chunk that keeps failing falls back to local normalization.
+
+        All chunks and retries share one deadline (the gateway's). Chunks still unfinished
+        when it passes are cancelled together as one missed deadline: at most one circuit
+        breaker failure, and none if every unfinished chunk was still queued locally.
+        """
+        chunks = split_into_chunks(whisper_text, max_chunk_tokens, overlap_sentences)
+        print(f"✂️  Correcting transcript in {len(chunks)} chunks...")
+
+        # Entities are selected per chunk so each prompt carries only the names it needs
+        entities = [self._entities_for(" ".join(chunk)) for chunk in chunks]
+        results = [None] * len(chunks)
+        pending = {}
+        for i, (context, body) in enumerate(chunks):
+            cached = self._cached(body, detected_language, entities[i], context)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending[i] = None
+
+        deadline = self.gateway.deadline
+        started = time.monotonic()
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            remaining = None if deadline is None else deadline - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                break
+            futures = {}
+            failed = {}
+            for i in pending:
+                try:
+                    futures[i] = self.gateway.submit(self._build_prompt(chunks[i][1], entities[i], chunks[i][0]),
+                                                     model=self.model_id, priority=PRIORITY_HIGH)
+                except CircuitOpenError as e:
+                    failed[i] = e
+            _, not_done = wait(futures.values(), timeout=remaining)
+            if not_done:
+                self.gateway.cancel(*not_done, deadline_exceeded=True)
+            for i, future in futures.items():
+                if future in not_done:
+                    failed[i] = DeadlineExceeded(f"Chunked correction exceeded its {deadline:g}s deadline.")
+                    continue
+                try:
+                    context, body = chunks[i]
+                    results[i] = self._store(body, detected_language, future.result(), entities[i], context)
+                except Exception as e:
+                    failed[i] = e
+            pending = failed
+            if any(isinstance(e, (CircuitOpenError, DeadlineExceeded)) for e in pending.values()):
+                break
+            if pending and attempt < max_attempts - 1:
+                print(f"⚠️ {len(pending)} chunk(s) failed. Retrying only those...")
+
+        for i, error in pending.items():
+            print(f"Warning: Chunk {i + 1}/{len(chunks)} correction failed, using local normalization: {error}")
+            results[i] = self._local_fallback(chunks[i][1])
+
+        return " ".join(r for r in results if r)
+
+    def _local_fallback(self, text):
+        if not self.local_fallback:
+            return text
+        normalized = self.normalizer.normalize(text)
+        if self.normalizer.last_changes:
+            print(f"🔧 Local normalization applied {len(self.normalizer.last_changes)} fix(es).")
+        return normalized
+
+    def _entities_for(self, text):
+        if self.entity_index is None:
+            return self.known_entities
+        return self.entity_index.entities_for(text, self.known_entities)
+
+    def _build_prompt(self, whisper_text, entities, context=""):
+        entities_context = "\n".join([f"- {k}: {v}" for k, v in entities.items()])
+
+        context_block = ""
+        if context:
+            context_block = f"""
+        PRECEDING CONTEXT (already corrected elsewhere; use it for meaning only, do NOT output it):
+        "{context}"
+        """
         
-        prompt = f"""
+        return f"""
         You are an expert medical transcriptionist and language expert.
         
         TASK:
@@ -59,39 +196,76 @@ class PostWhisperAccuracyPipeline:
         {entities_context}
          Ensure these specific names and details are spelled exactly as provided above.
         5. Return ONLY the cleaned English text. No explanations.
-
+        {context_block}
         INPUT TEXT:
         "{whisper_text}"
 
         CLEANED TEXT:
         """
 
-        max_retries = 2
-        base_delay = 10
-
-        for attempt in range(max_retries):
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model_id,
-                    contents=prompt
-                )
-                # Basic cleaning of response in case models adds quotes
-                cleaned_text = response.text.strip().replace('"', '')
-                return cleaned_text
-            except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    if attempt < max_retries - 1:
-                        wait_time = base_delay * (2 ** attempt)
-                        print(f"⚠️ Quota exceeded. Retrying accuracy correction in {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                
-                print(f"Warning: Gemini-based accuracy pipeline failed: {e}")
-                # Fallback to raw text if API fails
-                return whisper_text
-        
-        return whisper_text
+    def _cache_key(self, text, detected_language, entities, context=""):
+        if self.cache is None:
+            return None
+        extra = {"context": context} if context else {}
+        # Keyed on the entities actually injected, so a growing directory does not
+        # invalidate cached corrections that never used the new names
+        return self.cache.make_key(
+            self.model_id, self.PROMPT_VERSION, text,
+            entities=entities, language=detected_language, **extra
+        )
+
+    def _cached(self, text, detected_language, entities, context=""):
+        key = self._cache_key(text, detected_language, entities, context)
+        return self.cache.get(key) if key is not None else None
+
+    def _store(self, text, detected_language, response, entities, context=""):
+        # Basic cleaning of response in case models adds quotes
+        cleaned_text = response.text.strip().replace('"', '')
+        key = self._cache_key(text, detected_language, entities, context)
+        if key is not None:
+            self.cache.put(key, cleaned_text)
+        return cleaned_text
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def split_into_chunks(text, max_chunk_tokens=600, overlap_sentences=1):
+    """
+    Split text at sentence boundaries into chunks within a token budget.
+
+    Returns:
+        list: (context, body) tuples, where context is the tail of the previous chunk.
+    """
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+
+    # Whisper occasionally emits very long unpunctuated runs; split those by words
+    pieces = []
+    for sentence in sentences:
+        if estimate_tokens(sentence) <= max_chunk_tokens:
+            pieces.append(sentence)
+            continue
+        words = sentence.split()
+        step = max(1, max_chunk_tokens * 4 // 6)  # ~6 characters per word incl. space
+        pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+    chunks = []
+    current = []
+    for piece in pieces:
+        if current and estimate_tokens(" ".join(current + [piece])) > max_chunk_tokens:
+            chunks.append(current)
+            current = []
+        current.append(piece)
+    if current:
+        chunks.append(current)
+
+    result = []
+    for i, body in enumerate(chunks):
+        context = " ".join(chunks[i - 1][-overlap_sentences:]) if i > 0 and overlap_sentences else ""
+        result.append((context, " ".join(body)))
+    return result
 
 if __name__ == "__main__":
     # Test
@@ -3,26 +3,38 @@ Summary Agent
 Uses Google's Gemini API to generate concise medical summaries from transcribed text.
 """
 
-from google import genai
+import re
 import sys
 import os
+import json
 import time
+import uuid
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import GEMINI_API_KEY
+from agents.gemini_cache import get_default_cache
+from agents.gemini_gateway import get_gateway, PRIORITY_NORMAL, PRIORITY_LOW
+
+TRANSCRIPTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "transcriptions")
+PENDING_FILE = os.path.join(TRANSCRIPTIONS_DIR, "pending_summaries.jsonl")
 
 class SummaryAgent:
-    def __init__(self):
+    # Bump whenever the prompt template changes so cached summaries are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, cache=None, use_cache=True):
         if not GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is missing. Please set it in .env or environment variables.")
         
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
+        # Shared client, rate limiter and retry scheduler for all Gemini agents
+        self.gateway = get_gateway()
         # Using gemini-flash-latest alias (Likely maps to 1.5 Flash or stable version)
         self.model_id = 'gemini-flash-latest'
-
-
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        # Timings of the most recent stream_summary call
+        self.last_timings = {}
 
     def generate_summary(self, text):
         """
@@ -31,7 +43,140 @@ class SummaryAgent:
         if not text:
             return "No text provided for summary."
 
-        prompt = f"""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_id, self.PROMPT_VERSION, text)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("⚡ Using cached clinical summary.")
+                return cached
+
+        # Quota errors are retried with backoff inside the gateway; anything still failing
+        # (circuit open, deadline, API error) is queued like a failed stream_summary
+        try:
+            response = self.gateway.generate(self._build_prompt(text), model=self.model_id,
+                                             priority=PRIORITY_NORMAL)
+        except Exception as e:
+            return self.queue_for_retry(text, reason=str(e))
+        if cache_key is not None and response.text:
+            self.cache.put(cache_key, response.text)
+        return response.text
+
+    def queue_for_retry(self, text, reason=""):
+        """
+        Park a transcript whose summary could not be generated (circuit open, deadline
+        exceeded or API error) so `retry_pending` can produce it later, and return a
+        placeholder note.
+        """
+        os.makedirs(TRANSCRIPTIONS_DIR, exist_ok=True)
+        job_id = uuid.uuid4().hex[:12]
+        with open(PENDING_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": job_id, "queued_at": time.time(), "reason": reason, "text": text}) + "\n")
+        print(f"⏳ Summary queued for retry (id {job_id}): {reason}")
+        return f"Summary pending: Gemini is unavailable, queued for retry (id {job_id})."
+
+    def retry_pending(self):
+        """
+        Generate summaries for every queued transcript. Each result is written to
+        transcriptions/summary_<id>.txt; jobs that fail again stay in the queue.
+
+        Returns:
+            int: Number of summaries generated.
+        """
+        if not os.path.exists(PENDING_FILE):
+            return 0
+        with open(PENDING_FILE, "r", encoding="utf-8") as f:
+            jobs = [json.loads(line) for line in f if line.strip()]
+
+        remaining = []
+        done = 0
+        for job in jobs:
+            try:
+                response = self.gateway.generate(self._build_prompt(job["text"]), model=self.model_id,
+                                                 priority=PRIORITY_LOW)
+            except Exception as e:
+                print(f"⚠️ Summary {job['id']} still failing: {e}")
+                remaining.append(job)
+                continue
+            output_file = os.path.join(TRANSCRIPTIONS_DIR, f"summary_{job['id']}.txt")
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(response.text)
+            if self.cache is not None:
+                self.cache.put(self.cache.make_key(self.model_id, self.PROMPT_VERSION, job["text"]), response.text)
+            print(f"✅ Summary {job['id']} saved to '{output_file}'")
+            done += 1
+
+        with open(PENDING_FILE, "w", encoding="utf-8") as f:
+            for job in remaining:
+                f.write(json.dumps(job) + "\n")
+        return done
+
+    def stream_summary(self, text):
+        """
+        Streams the clinical summary, yielding note sections (paragraphs or headed
+        blocks) as soon as each one is complete.
+
+        Time to first token and total generation time are stored in `self.last_timings`.
+
+        If the call fails before or during streaming (including an open circuit or a stream
+        that outlives the gateway deadline), the transcript is queued for retry and the
+        placeholder note is yielded last. `self.last_timings["failed"]` is then set, and
+        any sections already yielded are an incomplete summary.
+        """
+        started = time.monotonic()
+        self.last_timings = {}
+        if not text:
+            yield "No text provided for summary."
+            return
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_id, self.PROMPT_VERSION, text)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.last_timings = {"cached": True, "ttft_s": 0.0, "total_s": round(time.monotonic() - started, 3)}
+                yield from split_sections(cached)
+                return
+
+        buffer = ""
+        full_text = ""
+        ttft = None
+        try:
+            for chunk in self.gateway.stream(self._build_prompt(text), model=self.model_id):
+                piece = chunk.text or ""
+                if not piece:
+                    continue
+                if ttft is None:
+                    ttft = time.monotonic() - started
+                full_text += piece
+                buffer += piece
+
+                # Emit every section that is complete; keep the unfinished tail buffered
+                breaks = list(SECTION_BREAK.finditer(buffer))
+                if breaks:
+                    last = breaks[-1]
+                    complete, buffer = buffer[:last.start()], buffer[last.end():]
+                    yield from split_sections(complete)
+        except Exception as e:
+            # Nothing partial is cached; the whole summary is regenerated from the queue
+            self.last_timings = {"cached": False, "failed": True, "partial": bool(full_text),
+                                 "total_s": round(time.monotonic() - started, 3)}
+            yield self.queue_for_retry(text, reason=str(e))
+            return
+
+        if buffer.strip():
+            yield buffer.strip()
+
+        self.last_timings = {
+            "cached": False,
+            "ttft_s": round(ttft, 3) if ttft is not None else None,
+            "total_s": round(time.monotonic() - started, 3),
+        }
+        if cache_key is not None and full_text:
+            self.cache.put(cache_key, full_text)
+
+    def _build_prompt(self, text):
+        return f"""
         You are a healthcare assistant.
         
         Create a clear and structured medical summary from the transcription below.
@@ -50,34 +195,25 @@ class SummaryAgent:
         
         Clinical Note:
         """
-        
-        # Increased retries to handle long rate limit pauses (up to 60s)
-        max_retries = 2
-        base_delay = 10
 
-        for attempt in range(max_retries):
-            try:
-                response = self.client.models.generate_content(
-                    model=self.model_id,
-                    contents=prompt
-                )
-                return response.text
-            except Exception as e:
-                # Check for 429 Resource Exhausted
-                # The error message from SDK usually contains the code or status
-                error_str = str(e)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    if attempt < max_retries - 1:
-                        wait_time = base_delay * (2 ** attempt)
-                        print(f"⚠️ Quota exceeded. Retrying summary generation in {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                
-                return f"Error generating summary: {e}"
+
+# Blank lines, or a line break right before a markdown heading
+SECTION_BREAK = re.compile(r"\n[ \t]*\n|\n(?=#+ )")
+
+
+def split_sections(text):
+    """Split a note into sections at blank lines or markdown headings."""
+    return [b.strip() for b in SECTION_BREAK.split(text) if b.strip()]
 
 if __name__ == "__main__":
-    # Test block
     agent = SummaryAgent()
+    if "--retry-pending" in sys.argv:
+        print(f"Generated {agent.retry_pending()} queued summaries.")
+        sys.exit(0)
+
+    # Test block
     sample_text = "My name is Aysha Sahira and I have had a severe headache since yesterday. I also feel a bit feverish."
     print("Generating summary...")
-    print(agent.generate_summary(sample_text))
+    for section in agent.stream_summary(sample_text):
+        print(section + "\n", flush=True)
+    print(f"⏱️ {agent.last_timings}")
@@ -0,0 +1,219 @@
+"""
+Terminology Loader
+Loads large clinical terminologies (SNOMED CT, ICD or in-house lists exported as CSV, TSV
+or JSONL) into a matcher whose matches carry concept codes. Terms are tokenized once with
+the pipeline's tokenizer and stored as lowercase token sequences; the compiled index is
+written to disk and reused on later starts until the source file changes. Restoring it is
+a JSON load, whereas rebuilding spaCy pattern Docs for a PhraseMatcher costs nearly as
+much as tokenizing again.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import TERMINOLOGY_CACHE_DIR
+
+# Bump when the cache layout changes
+CACHE_FORMAT = "1"
+
+# Source categories mapped onto the extractor's labels
+CATEGORY_LABELS = {
+    "symptom": "SYMPTOM",
+    "finding": "SYMPTOM",
+    "sign": "SYMPTOM",
+    "disease": "DISEASE",
+    "disorder": "DISEASE",
+    "diagnosis": "DISEASE",
+    "medicine": "MEDICINE",
+    "drug": "MEDICINE",
+    "product": "MEDICINE",
+}
+
+
+def _synonyms(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    for sep in ("|", ";"):
+        if sep in value:
+            return [v.strip() for v in value.split(sep) if v.strip()]
+    return [value.strip()]
+
+
+def iter_concepts(path):
+    """
+    Yield concepts from a terminology file.
+
+    CSV/TSV need a header with "code" and "term" columns, plus optional "synonyms"
+    ("|" or ";" separated), "category" and "system". JSONL lines use the same keys,
+    with "synonyms" as a list or string.
+
+    Yields:
+        dict: {"code", "term", "synonyms", "label", "system"}
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if ext == ".jsonl":
+            rows = (json.loads(line) for line in f if line.strip())
+        elif ext in (".csv", ".tsv"):
+            rows = csv.DictReader(f, delimiter="\t" if ext == ".tsv" else ",")
+        else:
+            raise ValueError(f"Unsupported terminology format: {path}")
+
+        for row in rows:
+            code = str(row.get("code") or "").strip()
+            term = str(row.get("term") or "").strip()
+            if not code or not term:
+                continue
+            category = str(row.get("category") or "").strip().lower()
+            yield {
+                "code": code,
+                "term": term,
+                "synonyms": _synonyms(row.get("synonyms")),
+                "label": CATEGORY_LABELS.get(category, category.upper() or "CONCEPT"),
+                "system": str(row.get("system") or "").strip(),
+            }
+
+
+def source_hash(path, nlp):
+    """Identifies a compiled matcher: source file contents, tokenizer and cache format."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    import spacy
+    meta = f"{CACHE_FORMAT}|{spacy.__version__}|{nlp.lang}|{nlp.meta.get('name')}|{nlp.meta.get('version')}"
+    digest.update(meta.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TerminologyMatcher:
+    """Phrase matcher over a terminology; each match is reported with its concept."""
+
+    def __init__(self, concepts, patterns):
+        """
+        Args:
+            concepts (dict): code -> {"code", "term", "label", "system"}.
+            patterns (dict): Lowercase tokens joined by spaces -> list of codes.
+        """
+        self.concepts = concepts
+        self.patterns = patterns
+        self.max_len = 0
+        # Every proper prefix, so a scan stops as soon as no term can continue
+        self._prefixes = set()
+        for key in patterns:
+            tokens = key.split(" ")
+            self.max_len = max(self.max_len, len(tokens))
+            for n in range(1, len(tokens)):
+                self._prefixes.add(" ".join(tokens[:n]))
+
+    def __len__(self):
+        return len(self.concepts)
+
+    @classmethod
+    def load(cls, nlp, path, cache_dir=TERMINOLOGY_CACHE_DIR):
+        """
+        Load the matcher for terminology file `path`, from the compiled cache when the
+        file is unchanged, otherwise by tokenizing every term and writing the cache.
+        """
+        cache_file = os.path.join(cache_dir, f"{source_hash(path, nlp)}.json")
+
+        start = time.perf_counter()
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                compiled = json.load(f)
+            matcher = cls(compiled["concepts"], compiled["patterns"])
+            print(f"📚 Loaded {len(matcher)} concepts ({len(matcher.patterns)} terms) from cache "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return matcher
+
+        concepts = {}
+        codes = []
+        texts = []
+        for concept in iter_concepts(path):
+            code = concept["code"]
+            concepts.setdefault(code, {k: concept[k] for k in ("code", "term", "label", "system")})
+            for text in dict.fromkeys([concept["term"], *concept["synonyms"]]):
+                codes.append(code)
+                texts.append(text)
+
+        patterns = {}
+        for code, doc in zip(codes, nlp.tokenizer.pipe(texts, batch_size=1000)):
+            key = " ".join(t.lower_ for t in doc if not t.is_space)
+            if key:
+                matched = patterns.setdefault(key, [])
+                if code not in matched:
+                    matched.append(code)
+
+        matcher = cls(concepts, patterns)
+        print(f"📚 Compiled {len(matcher)} concepts ({len(patterns)} terms) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.abspath(path), "concepts": concepts, "patterns": patterns}, f,
+                      ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+        return matcher
+
+    def __call__(self, doc, longest=True):
+        """
+        Concepts mentioned in `doc`.
+
+        Args:
+            longest (bool): Report only the longest term starting at each position and
+                skip past it, so "pain" inside "chest pain" is not reported.
+
+        Returns:
+            list: {"text", "code", "term", "label", "system", "start", "end"} dicts, with
+                text as lowercase tokens and start/end as token offsets. A term shared by several concepts yields one
+                entry per concept.
+        """
+        tokens = [t for t in doc if not t.is_space]
+        words = [t.lower_ for t in tokens]
+        results = []
+        i = 0
+        while i < len(words):
+            found = []
+            key = ""
+            for j in range(i, min(i + self.max_len, len(words))):
+                key = f"{key} {words[j]}" if key else words[j]
+                if key in self.patterns:
+                    found.append((j + 1, key))
+                if key not in self._prefixes:
+                    break
+            if longest:
+                found = found[-1:]
+            for end, key in found:
+                start, stop = tokens[i].i, tokens[end - 1].i + 1
+                for code in self.patterns[key]:
+                    results.append({"text": key, **self.concepts[code],
+                                    "start": start, "end": stop})
+            i = found[-1][0] if longest and found else i + 1
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import spacy
+
+    parser = argparse.ArgumentParser(description="Compile a terminology file into the matcher cache")
+    parser.add_argument("terminology", help="CSV, TSV or JSONL terminology file")
+    parser.add_argument("--model", default="en_core_web_sm", help="spaCy pipeline whose tokenizer is used")
+    parser.add_argument("--text", default=None, help="Optional text to match after loading")
+    args = parser.parse_args()
+
+    nlp = spacy.load(args.model, disable=["ner", "lemmatizer"])
+    matcher = TerminologyMatcher.load(nlp, args.terminology)
+    if args.text:
+        for match in matcher(nlp(args.text)):
+            print(f"{match['code']:>12}  {match['label']:<8} {match['text']}")
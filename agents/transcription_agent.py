@@ -1,4 +1,5 @@
 import whisper
+import json
 import os
 import sys
 
@@ -7,49 +8,189 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.post_whisper_accuracy_pipeline import PostWhisperAccuracyPipeline
 from agents.summary_agent import SummaryAgent
+from agents.whisper_server import get_model, WhisperServerClient
+from agents.vad_agent import trim_silence
+from agents.parallel_transcription_agent import transcribe_parallel
+from agents.audio_cleaning_agent import clean_audio_array
+from agents.gemini_cache import get_default_cache
+from agents.gemini_gateway import get_gateway
+from agents.consultation_agent import StructuredConsultationAgent
+from agents.entity_index import get_entity_index
 
+# Entities can be passed dynamically in a real app; these are the defaults
+KNOWN_ENTITIES = {
+    "name": "Aysha Saheera", 
+    "college": "KMCT Institute of Emerging Technology and Management"
+}
 
-def transcribe_audio(input_file="audio/cleaned.wav", model_size="large"):
+
+def transcribe_audio(input_file="audio/cleaned.wav", model_size="large", use_server=False, vad=True,
+                     workers=1, audio=None, structured=False):
     """
     Transcribe audio file to English text using OpenAI Whisper.
     
     Args:
         input_file (str): Path to the input audio file.
         model_size (str): Size of the Whisper model to use (tiny, base, small, medium, large).
+        use_server (bool): Send the job to a running Whisper server (agents/whisper_server.py)
+            instead of loading the model in this process.
+        vad (bool): Drop non-speech regions before decoding. Segment timestamps are
+            mapped back to the original recording.
+        workers (int): When greater than 1, split the audio at silences and decode the
+            chunks on this many processes, each holding its own model.
+        audio (np.ndarray): Already-decoded 16kHz float32 samples. When given, `input_file`
+            is not read and Whisper receives the array directly.
+        structured (bool): Correct, summarize and extract medical data in a single
+            Gemini call (see post_process_transcript).
         
     Returns:
         str: Transcribed English text.
     """
-    if not os.path.exists(input_file):
-        raise FileNotFoundError(f"Audio file not found: {input_file}")
+    if audio is None:
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"Audio file not found: {input_file}")
+        audio = input_file
+        source = f"'{input_file}'"
+    else:
+        source = "cleaned audio (in memory)"
 
-    print(f"🔄 Loading Whisper model ('{model_size}')...")
-    model = whisper.load_model(model_size)
-    
-    print(f"🎧 Transcribing '{input_file}' to English...")
+    timestamp_map = None
+    if vad:
+        # Decode to 16kHz float32 once so silence can be dropped before Whisper sees it
+        if isinstance(audio, str):
+            audio = whisper.load_audio(audio)
+        audio, timestamp_map, vad_report = trim_silence(audio)
+        if vad_report["fallback"]:
+            print("⚠️ VAD found almost no speech; transcribing the untrimmed audio.")
+        else:
+            print(f"🔇 VAD removed {vad_report['removed_seconds']}s of {vad_report['original_seconds']}s "
+                  f"({vad_report['removed_percent']}%) as silence")
+
+    print(f"🎧 Transcribing {source} to English...")
     # task="translate" ensures the output is in English regardless of input language
-    result = model.transcribe(input_file, task="translate")
+    if vad and len(audio) == 0:
+        print("⚠️ No speech detected.")
+        result = {"text": "", "segments": [], "language": "en"}
+    elif use_server:
+        result = WhisperServerClient().transcribe(audio, model_size=model_size, task="translate")
+    elif workers > 1:
+        # Trimmed audio has no silences left to find; cut where the VAD removed them
+        cuts = timestamp_map.joins() if timestamp_map is not None else None
+        result = transcribe_parallel(audio, model_size=model_size, workers=workers, task="translate",
+                                     cuts=cuts)
+    else:
+        # Models are cached per process, so repeated calls skip the load
+        model = get_model(model_size)
+        result = model.transcribe(audio, task="translate")
+
+    if timestamp_map is not None:
+        result["segments"] = timestamp_map.remap_segments(result.get("segments", []))
+        result["vad"] = vad_report
     
     transcribed_text = result["text"].strip()
     
     print("✅ Transcription complete:")
     print(f"📝 Raw Whisper: \"{transcribed_text}\"")
 
+    # Use 'en' as default or detect from whisper result if available (result['language'])
+    # Whisper result object has language info: result['language']
+    detected_lang = result.get('language', 'en')
+
+    return post_process_transcript(transcribed_text, detected_lang, structured=structured)
+
+
+def run_pipeline(raw_file="audio/raw.wav", save_cleaned=None, clean_workers=1, noise_profile=None, **kwargs):
+    """
+    Clean a raw recording and transcribe it without writing the cleaned audio to disk.
+
+    The cleaned float32 array goes straight into Whisper, skipping the int16 WAV write,
+    the ffmpeg decode and both sample conversions.
+
+    Args:
+        raw_file (str): Path to the raw recording.
+        save_cleaned (str): Optionally also write the cleaned WAV to this path.
+        clean_workers (int): Processes used for noise reduction.
+        noise_profile (str): Room/microphone name whose cached noise profile is reused.
+        **kwargs: Passed to transcribe_audio.
+
+    Returns:
+        tuple: (cleaned text, clinical summary or None)
+    """
+    audio = clean_audio_array(raw_file, output_file=save_cleaned, workers=clean_workers,
+                              noise_profile=noise_profile)
+    return transcribe_audio(audio=audio, **kwargs)
+
+
+def post_process_transcript(transcribed_text, detected_lang="en", structured=False):
+    """
+    Correct a raw Whisper transcript, summarize it, and save it for the medical extractor.
+
+    Args:
+        transcribed_text (str): Raw Whisper output.
+        detected_lang (str): Language reported by Whisper.
+        structured (bool): Ask Gemini once for the cleaned text, summary and medical data
+            as validated JSON, and write medical_data.json directly. Falls back to the
+            separate correction and summary calls if the structured call fails.
+
+    Returns:
+        tuple: (cleaned text, clinical summary or None)
+    """
+    # Ensure transcriptions directory exists
+    output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "transcriptions")
+    os.makedirs(output_dir, exist_ok=True)
+
+    analysis = None
+    if structured:
+        print("\nRunning structured consultation analysis (single Gemini call)...")
+        try:
+            analysis = StructuredConsultationAgent(known_entities=KNOWN_ENTITIES,
+                                                   entity_index=get_entity_index()).analyze(
+                transcribed_text, detected_language=detected_lang
+            )
+        except Exception as e:
+            print(f"Warning: Structured analysis failed, using separate calls: {e}")
+
+    if analysis is not None:
+        final_cleaned_text = analysis["cleaned_text"]
+        summary = analysis["summary"]
+        print("\n✨ Cleaned & Corrected Text:")
+        print(f"👉 \"{final_cleaned_text}\"")
+        print("\n📝 Final Clinical Summary:")
+        print(f"{summary}")
+
+        # Same layout medical_extractor.py writes, so later steps work unchanged
+        medical_file = os.path.join(output_dir, "medical_data.json")
+        with open(medical_file, "w", encoding="utf-8") as f:
+            json.dump(analysis["medical_data"], f, indent=2)
+        print(f"\n💾 Medical data saved to '{medical_file}'")
+    else:
+        final_cleaned_text, summary = _correct_and_summarize(transcribed_text, detected_lang)
+    
+    # Save final cleaned text to file for the medical extractor
+    output_filename = os.path.join(output_dir, "transcription_output.txt")
+    with open(output_filename, "w", encoding="utf-8") as f:
+        f.write(final_cleaned_text)
+    print(f"\n💾 Transcription saved to '{output_filename}'")
+
+    stats = get_default_cache().stats()
+    print(f"🗄️  Gemini cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    try:
+        metrics = get_gateway().metrics()
+        print(f"📡 Gemini queue: {metrics['completed']} calls, {metrics['retries']} retries, "
+              f"avg wait {metrics['wait_avg_s']}s (p95 {metrics['wait_p95_s']}s)")
+    except ValueError:
+        pass
+    
+    return final_cleaned_text, summary
+
+
+def _correct_and_summarize(transcribed_text, detected_lang):
     # -------------------------------------------------------
     # Post-Processing Integration
     # -------------------------------------------------------
     print("\nStarting Post-Whisper Accuracy Pipeline...")
     
-    # Initialize pipeline (Entities can be passed dynamically in a real app)
-    # For now, using default known entities or empty
-    pipeline = PostWhisperAccuracyPipeline(known_entities={
-        "name": "Aysha Saheera", 
-        "college": "KMCT Institute of Emerging Technology and Management"
-    })
-    
-    # Use 'en' as default or detect from whisper result if available (result['language'])
-    # Whisper result object has language info: result['language']
-    detected_lang = result.get('language', 'en')
+    pipeline = PostWhisperAccuracyPipeline(known_entities=KNOWN_ENTITIES, entity_index=get_entity_index())
     
     final_cleaned_text = pipeline.process(transcribed_text, detected_language=detected_lang)
     
@@ -60,26 +201,52 @@ def transcribe_audio(input_file="audio/cleaned.wav", model_size="large"):
     # Summary Generation Integration
     # -------------------------------------------------------
     print("\nGenerating Clinical Summary (Gemini)...")
+    sections = []
     try:
         summary_agent = SummaryAgent()
-        summary = summary_agent.generate_summary(final_cleaned_text)
         print("\n📝 Final Clinical Summary:")
-        print(f"{summary}")
+        # Render each section of the note as soon as it arrives
+        for section in summary_agent.stream_summary(final_cleaned_text):
+            sections.append(section)
+            print(f"{section}\n", flush=True)
+        timings = summary_agent.last_timings
+        if timings.get("failed"):
+            # Sections printed before the failure are incomplete; keep only the pending note
+            if timings.get("partial"):
+                print("⚠️ Summary was interrupted; the partial note above is discarded.")
+            sections = sections[-1:]
+        elif timings.get("cached"):
+            print("⚡ Using cached clinical summary.")
+        else:
+            print(f"⏱️ First token after {timings['ttft_s']}s, complete after {timings['total_s']}s")
     except Exception as e:
         print(f"Warning: Could not generate summary: {e}")
-        summary = None
-    
-    # Save final cleaned text to file for the medical extractor
-    # Ensure transcriptions directory exists
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "transcriptions")
-    os.makedirs(output_dir, exist_ok=True)
-    
-    output_filename = os.path.join(output_dir, "transcription_output.txt")
-    with open(output_filename, "w", encoding="utf-8") as f:
-        f.write(final_cleaned_text)
-    print(f"\n💾 Transcription saved to '{output_filename}'")
-    
+
+    summary = "\n\n".join(sections) if sections else None
+
     return final_cleaned_text, summary
 
 if __name__ == "__main__":
-    transcribe_audio()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Transcribe, correct and summarize a consultation")
+    parser.add_argument("input_file", nargs="?", default="audio/cleaned.wav")
+    parser.add_argument("--model", default="large", help="Whisper model size")
+    parser.add_argument("--server", action="store_true", help="Use the resident Whisper server")
+    parser.add_argument("--no-vad", action="store_true", help="Keep silent regions")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel Whisper processes")
+    parser.add_argument("--raw", action="store_true",
+                        help="Treat input_file as a raw recording: clean it in memory, then transcribe")
+    parser.add_argument("--save-cleaned", default=None, help="With --raw, also write the cleaned WAV here")
+    parser.add_argument("--noise-profile", default=None,
+                        help="With --raw, reuse the cached noise profile of this room/microphone")
+    parser.add_argument("--structured", action="store_true",
+                        help="One Gemini call for correction, summary and medical data extraction")
+    args = parser.parse_args()
+
+    options = dict(model_size=args.model, use_server=args.server, vad=not args.no_vad, workers=args.workers,
+                   structured=args.structured)
+    if args.raw:
+        run_pipeline(args.input_file, save_cleaned=args.save_cleaned, noise_profile=args.noise_profile, **options)
+    else:
+        transcribe_audio(args.input_file, **options)
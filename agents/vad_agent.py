@@ -0,0 +1,159 @@
+"""
+Voice Activity Detection Agent
+Drops non-speech regions before Whisper sees the audio and keeps a timestamp map so that
+segment times can be translated back to positions in the original recording.
+"""
+
+import numpy as np
+from bisect import bisect_left, bisect_right
+
+
+def detect_speech_regions(audio, sr=16000, frame_ms=30, margin_db=10.0,
+                          min_silence_seconds=0.5, min_speech_seconds=0.25, padding_seconds=0.2,
+                          min_floor_db=-70.0, max_floor_db=-50.0):
+    """
+    Find speech regions with an adaptive frame-energy detector.
+
+    The noise floor is estimated as the 10th percentile of frame energies, clamped to
+    [`min_floor_db`, `max_floor_db`] dBFS, and frames more than `margin_db` above it count
+    as speech. The clamp keeps a recording with little silence (where the percentile lands
+    on speech) or with digital silence from moving the threshold to an absurd level.
+    Regions are padded, short gaps are bridged and very short bursts are discarded.
+
+    Args:
+        audio (np.ndarray): Mono float audio.
+        sr (int): Sample rate in Hz.
+        frame_ms (int): Analysis frame length in milliseconds.
+        margin_db (float): Level above the noise floor treated as speech.
+        min_silence_seconds (float): Gaps shorter than this stay inside a region.
+        min_speech_seconds (float): Regions shorter than this are dropped.
+        padding_seconds (float): Audio kept on each side of a region.
+        min_floor_db (float): Lowest noise floor used, in dBFS.
+        max_floor_db (float): Highest noise floor used, in dBFS.
+
+    Returns:
+        list: (start_sample, end_sample) tuples in ascending order.
+    """
+    frame_len = max(1, int(sr * frame_ms / 1000))
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = np.asarray(audio[:n_frames * frame_len], dtype=np.float32).reshape(n_frames, frame_len)
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise_floor = float(np.clip(np.percentile(energy_db, 10), min_floor_db, max_floor_db))
+    speech = energy_db > noise_floor + margin_db
+
+    # Edges of runs of speech frames
+    padded = np.concatenate(([False], speech, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    runs = list(zip(edges[0::2] * frame_len, edges[1::2] * frame_len))
+
+    pad = int(padding_seconds * sr)
+    min_gap = int(min_silence_seconds * sr)
+    min_len = int(min_speech_seconds * sr)
+
+    regions = []
+    for start, end in runs:
+        start = max(0, start - pad)
+        end = min(len(audio), end + pad)
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+
+    return [(int(s), int(e)) for s, e in regions if e - s >= min_len]
+
+
+class TimestampMap:
+    """Maps times in trimmed audio back to times in the original recording."""
+
+    def __init__(self, regions, sr=16000, fallback=False):
+        self.sr = sr
+        # The detector was not trusted and the audio was kept whole
+        self.fallback = fallback
+        self._original_starts = []
+        self._trimmed_starts = []
+        self._trimmed_ends = []
+        position = 0
+        for start, end in regions:
+            self._original_starts.append(start / sr)
+            self._trimmed_starts.append(position / sr)
+            position += end - start
+            self._trimmed_ends.append(position / sr)
+
+    def to_original(self, t, is_end=False):
+        """
+        Convert a trimmed-audio time to the original timeline.
+
+        A time that falls exactly on a cut belongs to the following region for start
+        times and to the preceding region for end times.
+        """
+        if not self._trimmed_starts:
+            return t
+        if is_end:
+            i = max(0, bisect_left(self._trimmed_ends, t))
+            i = min(i, len(self._trimmed_starts) - 1)
+        else:
+            i = max(0, bisect_right(self._trimmed_starts, t) - 1)
+        return float(self._original_starts[i] + (t - self._trimmed_starts[i]))
+
+    def joins(self):
+        """
+        Sample offsets in the trimmed audio where two kept regions meet (removed silences).
+
+        Returns None in fallback mode: nothing was removed, so the pauses are still in the
+        audio and callers should detect them there (split_at_silence does when cuts=None).
+        """
+        if self.fallback:
+            return None
+        return [int(round(t * self.sr)) for t in self._trimmed_ends[:-1]]
+
+    def remap_segments(self, segments):
+        """Return Whisper segments with start/end moved to the original timeline."""
+        return [
+            {**seg,
+             "start": self.to_original(seg["start"]),
+             "end": self.to_original(seg["end"], is_end=True)}
+            for seg in segments
+        ]
+
+
+def trim_silence(audio, sr=16000, min_kept_fraction=0.05, **kwargs):
+    """
+    Remove non-speech regions from audio.
+
+    If less than `min_kept_fraction` of the recording would be kept (e.g. constant noise
+    with nothing above the threshold), the detector is not trusted and the audio is
+    returned untrimmed, so Whisper still sees it.
+
+    Args:
+        audio (np.ndarray): Mono float audio.
+        sr (int): Sample rate in Hz.
+        min_kept_fraction (float): Smallest plausible share of speech.
+        **kwargs: Passed to detect_speech_regions.
+
+    Returns:
+        tuple: (trimmed float32 audio, TimestampMap, report dict)
+    """
+    regions = detect_speech_regions(audio, sr=sr, **kwargs)
+    kept = sum(e - s for s, e in regions)
+    fallback = len(audio) > 0 and kept < min_kept_fraction * len(audio)
+    if fallback:
+        regions = [(0, len(audio))]
+    if regions:
+        trimmed = np.concatenate([audio[s:e] for s, e in regions]).astype(np.float32, copy=False)
+    else:
+        trimmed = np.zeros(0, dtype=np.float32)
+
+    original_seconds = len(audio) / sr
+    kept_seconds = len(trimmed) / sr
+    report = {
+        "original_seconds": round(original_seconds, 2),
+        "kept_seconds": round(kept_seconds, 2),
+        "removed_seconds": round(original_seconds - kept_seconds, 2),
+        "removed_percent": round(100 * (1 - kept_seconds / original_seconds), 1) if original_seconds else 0.0,
+        "regions": len(regions),
+        "fallback": fallback,
+    }
+    return trimmed, TimestampMap(regions, sr=sr, fallback=fallback), report
@@ -0,0 +1,68 @@
+"""
+Incremental WAV Writer
+Appends 16-bit PCM frames to a WAV file as they arrive. The header is patched after
+every write, so the file on disk is always a valid, playable WAV.
+"""
+
+import os
+import wave
+import numpy as np
+
+
+class IncrementalWavWriter:
+    def __init__(self, filename, samplerate, channels=1):
+        """
+        Args:
+            filename (str): Path of the WAV file to create (overwritten if present).
+            samplerate (int): Sample rate in Hz.
+            channels (int): Number of interleaved channels.
+        """
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.filename = filename
+        self.samplerate = samplerate
+        self.frames_written = 0
+
+        self._file = open(filename, "wb")
+        self._wav = wave.open(self._file, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(samplerate)
+        # Emit an empty but valid header straight away
+        self._wav.writeframes(b"")
+        self._file.flush()
+
+    @property
+    def duration(self):
+        """Seconds of audio written so far."""
+        return self.frames_written / self.samplerate
+
+    def write(self, frames):
+        """
+        Append frames to the file.
+
+        Args:
+            frames (np.ndarray): int16 samples, or float samples in [-1, 1].
+        """
+        if len(frames) == 0:
+            return
+        if frames.dtype != np.int16:
+            frames = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+        # wave patches the RIFF/data sizes on every writeframes call
+        self._wav.writeframes(np.ascontiguousarray(frames).tobytes())
+        self._file.flush()
+        self.frames_written += len(frames)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._wav.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,320 @@
+"""
+Whisper Model Server
+Keeps Whisper models resident in memory and serves transcription jobs over a local socket,
+so consultations no longer pay the model loading cost on every run.
+
+Start the server once:
+    python agents/whisper_server.py --preload large
+"""
+
+import whisper
+import sys
+import os
+import time
+import queue
+import threading
+import secrets
+import argparse
+import ipaddress
+from collections import OrderedDict
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import (
+    WHISPER_SERVER_HOST,
+    WHISPER_SERVER_PORT,
+    WHISPER_SERVER_AUTHKEY,
+    WHISPER_SERVER_AUTHKEY_FILE,
+)
+
+# -------------------------------------------------------
+# In-process model cache
+# -------------------------------------------------------
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_model(model_size="large"):
+    """
+    Load a Whisper model once per process and return the resident instance.
+
+    Args:
+        model_size (str): Size of the Whisper model (tiny, base, small, medium, large).
+
+    Returns:
+        whisper.model.Whisper: The loaded model.
+    """
+    with _MODELS_LOCK:
+        model = _MODELS.get(model_size)
+        if model is None:
+            print(f"🔄 Loading Whisper model ('{model_size}')...")
+            model = whisper.load_model(model_size)
+            _MODELS[model_size] = model
+        return model
+
+
+# -------------------------------------------------------
+# Authentication
+# -------------------------------------------------------
+def load_authkey(create=False):
+    """
+    Shared secret for the server socket: WHISPER_SERVER_AUTHKEY when set, otherwise the
+    per-install key in WHISPER_SERVER_AUTHKEY_FILE. Requests are unpickled by the server,
+    so there is deliberately no built-in default.
+
+    Args:
+        create (bool): Generate the key file (mode 0600) if it does not exist yet.
+    """
+    if WHISPER_SERVER_AUTHKEY:
+        return WHISPER_SERVER_AUTHKEY.encode()
+
+    path = WHISPER_SERVER_AUTHKEY_FILE
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # another server created it first
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            print(f"🔑 Generated Whisper server key in '{path}'")
+
+    try:
+        with open(path, "rb") as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        key = b""
+    if not key:
+        raise RuntimeError(
+            "No Whisper server key: set WHISPER_SERVER_AUTHKEY or start the server once "
+            f"to generate '{path}'."
+        )
+    if os.name == "posix" and os.stat(path).st_mode & 0o077:
+        print(f"Warning: '{path}' is readable by other users; run chmod 600 on it.")
+    return key
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# -------------------------------------------------------
+# Scheduler
+# -------------------------------------------------------
+class _ModelWorker:
+    """
+    Owns one loaded model and runs its jobs one at a time, in arrival order.
+    Whisper inference is not safe to run concurrently on a single model instance,
+    so consultations sharing a model are queued here instead.
+    """
+
+    def __init__(self, model_size):
+        self.model_size = model_size
+        self.jobs = queue.Queue()
+        self.model = None
+        self.busy = False
+        self.last_used = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"whisper-{model_size}", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio, options):
+        future = Future()
+        self.jobs.put((future, audio, options))
+        return future
+
+    @property
+    def pending(self):
+        return self.jobs.qsize() + (1 if self.busy else 0)
+
+    def unload(self):
+        """Drop the model; it is reloaded lazily if another job arrives."""
+        self.model = None
+
+    def _run(self):
+        while True:
+            future, audio, options = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.busy = True
+            try:
+                if self.model is None:
+                    print(f"🔄 Loading Whisper model ('{self.model_size}')...")
+                    self.model = whisper.load_model(self.model_size)
+                started = time.monotonic()
+                result = self.model.transcribe(audio, **options)
+                result["elapsed"] = time.monotonic() - started
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.busy = False
+                self.last_used = time.monotonic()
+
+
+class WhisperModelServer:
+    """
+    Long-lived transcription worker.
+
+    Each requested model size is loaded once and kept resident. Jobs are received over a
+    local authenticated socket and scheduled per model, so several consultations can share
+    one loaded model. At most `max_models` models stay in memory; the least recently used
+    idle model is unloaded when a new size is requested.
+
+    Anyone holding the key can make the server unpickle arbitrary data, so it only listens
+    on loopback addresses unless `allow_remote` is set.
+    """
+
+    def __init__(self, host=WHISPER_SERVER_HOST, port=WHISPER_SERVER_PORT,
+                 authkey=None, max_models=2, allow_remote=False):
+        if not is_loopback(host):
+            if not allow_remote:
+                raise ValueError(
+                    f"Refusing to listen on non-loopback address '{host}'; "
+                    "pass allow_remote=True (--allow-remote) to expose the server."
+                )
+            print(f"Warning: Whisper server is reachable on '{host}'. Anyone with the key can "
+                  "run code on this machine; keep the port behind a firewall.")
+        self.address = (host, port)
+        self.authkey = authkey or load_authkey(create=True)
+        self.max_models = max_models
+        self._workers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _worker_for(self, model_size):
+        with self._lock:
+            worker = self._workers.get(model_size)
+            if worker is None:
+                worker = _ModelWorker(model_size)
+                self._workers[model_size] = worker
+            self._workers.move_to_end(model_size)
+
+            loaded = [w for w in self._workers.values() if w.model is not None or w is worker]
+            if len(loaded) > self.max_models:
+                for candidate in sorted(loaded, key=lambda w: w.last_used):
+                    if candidate is not worker and candidate.pending == 0:
+                        print(f"♻️ Unloading idle Whisper model ('{candidate.model_size}')")
+                        candidate.unload()
+                        break
+            return worker
+
+    def preload(self, model_size):
+        """Load a model before the first job arrives."""
+        worker = self._worker_for(model_size)
+        worker.model = whisper.load_model(model_size)
+
+    def status(self):
+        with self._lock:
+            return {
+                size: {"loaded": w.model is not None, "pending": w.pending}
+                for size, w in self._workers.items()
+            }
+
+    def _handle(self, conn):
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+
+                op = request.get("op")
+                if op == "transcribe":
+                    worker = self._worker_for(request.get("model_size", "large"))
+                    future = worker.submit(request["audio"], request.get("options", {}))
+                    try:
+                        conn.send({"ok": True, "result": future.result()})
+                    except Exception as e:
+                        conn.send({"ok": False, "error": str(e)})
+                elif op == "status":
+                    conn.send({"ok": True, "result": self.status()})
+                else:
+                    conn.send({"ok": False, "error": f"Unknown operation: {op}"})
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"🩺 Whisper server listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"Warning: Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+# -------------------------------------------------------
+# Client
+# -------------------------------------------------------
+class WhisperServerClient:
+    """Thin client for a running WhisperModelServer."""
+
+    def __init__(self, host=WHISPER_SERVER_HOST, port=WHISPER_SERVER_PORT, authkey=None):
+        self.address = (host, port)
+        self.authkey = authkey or load_authkey()
+
+    def _request(self, payload):
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(payload)
+            response = conn.recv()
+        if not response["ok"]:
+            raise RuntimeError(f"Whisper server error: {response['error']}")
+        return response["result"]
+
+    def transcribe(self, audio, model_size="large", **options):
+        """
+        Transcribe on the server. `audio` may be a file path (readable by the server)
+        or a float32 NumPy array sampled at 16kHz.
+        """
+        if isinstance(audio, str):
+            audio = os.path.abspath(audio)
+        return self._request({
+            "op": "transcribe",
+            "model_size": model_size,
+            "audio": audio,
+            "options": options,
+        })
+
+    def status(self):
+        return self._request({"op": "status"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident Whisper transcription server")
+    parser.add_argument("--host", default=WHISPER_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=WHISPER_SERVER_PORT)
+    parser.add_argument("--max-models", type=int, default=2,
+                        help="Maximum number of model sizes kept in memory")
+    parser.add_argument("--preload", nargs="*", default=[],
+                        help="Model sizes to load at startup (e.g. large small)")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="Allow listening on a non-loopback address")
+    args = parser.parse_args()
+
+    try:
+        server = WhisperModelServer(host=args.host, port=args.port, max_models=args.max_models,
+                                    allow_remote=args.allow_remote)
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    for size in args.preload:
+        print(f"🔄 Preloading Whisper model ('{size}')...")
+        server.preload(size)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n✅ Whisper server stopped.")
+
+
+if __name__ == "__main__":
+    main()
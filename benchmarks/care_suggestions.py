@@ -0,0 +1,94 @@
+"""
+Care suggestions benchmark
+Measures per-record cost of the care-suggestion index and end-to-end NDJSON batch
+throughput (run_batch) in-process and across worker processes, optionally with a
+knowledge base padded to thousands of keys.
+
+    python benchmarks/care_suggestions.py --records 50000 --workers 4 --kb-size 5000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agents.care_suggestions as care
+from agents.care_suggestions import CareIndex, DISEASE_CARE, SYMPTOM_CARE, run_batch
+
+SUMMARIES = [
+    "Patient reports loose motions and weakness for two days.",
+    "Known case of high blood pressure, now with headaches and giddiness.",
+    "Follow-up visit, no new complaints.",
+]
+
+
+def synthetic_records(count, seed=0):
+    rng = random.Random(seed)
+    diseases = list(DISEASE_CARE) + ["high bp", "uti", ""]
+    symptoms = list(SYMPTOM_CARE) + ["breathlessness", "rash", "cold"]
+    for i in range(count):
+        yield i, {
+            "diseases": [d for d in rng.sample(diseases, rng.randint(0, 2)) if d],
+            "symptoms": rng.sample(symptoms, rng.randint(0, 4)),
+            "summary": rng.choice(SUMMARIES),
+        }
+
+
+def padded_knowledge_base(size, seed=1):
+    """DISEASE_CARE plus `size` synthetic conditions, to show cost does not grow with keys."""
+    rng = random.Random(seed)
+    padded = dict(DISEASE_CARE)
+    for _ in range(size):
+        name = " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 9))) for _ in range(2))
+        padded[name] = ["Rest well."]
+    return padded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--kb-size", type=int, default=0, help="Extra synthetic knowledge-base keys")
+    args = parser.parse_args()
+
+    if args.kb_size:
+        care._care_index = CareIndex(disease_care=padded_knowledge_base(args.kb_size))
+    records = list(synthetic_records(args.records))
+    index = care.get_care_index()
+
+    start = time.perf_counter()
+    for _, record in records:
+        index.suggest(record["diseases"], record["symptoms"], record["summary"])
+    single_s = time.perf_counter() - start
+    print(f"{args.records} records, {len(index.automaton)} knowledge-base keys and synonyms")
+    print(f"  in-process:  {args.records / single_s:>10.0f} records/s "
+          f"({single_s / args.records * 1e6:.1f} µs/record)")
+
+    if args.kb_size:
+        # Workers build the default index; a padded one would not reach them
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "records.ndjson")
+        with open(source, "w", encoding="utf-8") as f:
+            for rid, record in records:
+                f.write(json.dumps({"id": rid, **record}) + "\n")
+        output = os.path.join(tmp, "suggestions.ndjson")
+
+        stats = run_batch(source, output, workers=1, chunk_size=args.chunk_size)
+        print(f"  run_batch in-process: {stats['per_second']:>10.0f} records/s")
+        if args.workers > 1:
+            stats = run_batch(source, output, workers=args.workers, chunk_size=args.chunk_size)
+            print(f"  run_batch {args.workers} workers:  {stats['per_second']:>10.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Medicine detection benchmark
+Measures sentences per second for the medicine detection step of medical_extractor,
+against the earlier per-sentence keyword scan, as the indicator list grows.
+
+    python benchmarks/medicine_detection.py --sentences 20000 --formulary-size 10000
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import string
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.medical_extractor import MedicalExtractor, MEDICINE_INDICATORS
+
+TEMPLATES = [
+    "Take {med} 500mg twice a day after food for 5 days.",
+    "I have had fever and cough since three days.",
+    "{med} syrup 5 ml at bedtime, 1-0-1 for 1 week.",
+    "Drink plenty of water and rest well.",
+    "Apply the cream on the rash in the morning.",
+    "Continue {med} tablet once daily before breakfast.",
+]
+
+
+def synthetic_names(count, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12))) for _ in range(count)]
+
+
+def legacy_scan(doc, indicators):
+    """The previous approach: substring checks of every indicator in every sentence."""
+    found = 0
+    for sent in doc.sents:
+        sent_text_lower = sent.text.lower()
+        if any(ind in sent_text_lower for ind in indicators):
+            [m for m in indicators if m in sent_text_lower]
+            re.search(r"(\d+\s?(?:mg|ml|g|mcg))", sent.text, re.IGNORECASE)
+            re.search(r"(?:for\s)(\d+\s(?:days|weeks))", sent.text, re.IGNORECASE)
+            found += 1
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=20000)
+    parser.add_argument("--formulary-size", type=int, default=5000, help="Extra medicine names to index")
+    parser.add_argument("--model", default="en_core_web_sm")
+    args = parser.parse_args()
+
+    names = synthetic_names(args.formulary_size)
+    extractor = MedicalExtractor(model=args.model, medicine_names=names)
+    try:
+        nlp = extractor.nlp
+    except OSError:
+        # Sentence splitting is all the detection step needs from the pipeline
+        import spacy
+        print(f"Model '{args.model}' not installed, using a blank English pipeline with a sentencizer.")
+        nlp = spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+
+    rng = random.Random(1)
+    sentences = [rng.choice(TEMPLATES).format(med=rng.choice(names or MEDICINE_INDICATORS))
+                 for _ in range(args.sentences)]
+    # Transcript-sized documents of 50 sentences
+    texts = [" ".join(sentences[i:i + 50]) for i in range(0, len(sentences), 50)]
+    docs = list(nlp.pipe(texts))
+    n_sents = sum(1 for doc in docs for _ in doc.sents)
+
+    start = time.perf_counter()
+    medicines = sum(len(extractor._extract_medicines(doc)) for doc in docs)
+    automaton_s = time.perf_counter() - start
+
+    indicators = MEDICINE_INDICATORS + names
+    start = time.perf_counter()
+    legacy = sum(legacy_scan(doc, indicators) for doc in docs)
+    legacy_s = time.perf_counter() - start
+
+    print(f"{n_sents} sentences, {len(indicators)} indicators")
+    print(f"  automaton + cue regex: {n_sents / automaton_s:>10.0f} sentences/s ({medicines} medicines)")
+    print(f"  per-sentence scan:     {n_sents / legacy_s:>10.0f} sentences/s ({legacy} sentences flagged)")
+
+
+if __name__ == "__main__":
+    main()
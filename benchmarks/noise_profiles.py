@@ -0,0 +1,90 @@
+"""
+Noise profile benchmark
+Measures the noise set-up cost (estimating the noise and its gating threshold from the
+recording vs loading a stored profile) and end-to-end block cleaning of a synthetic noisy
+recording without a profile, with a profile learned on the first run, and with the
+cached profile.
+
+    python benchmarks/noise_profiles.py --minutes 10 --block-seconds 30
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from scipy.io import wavfile
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agents.audio_cleaning_agent as cleaning
+from agents.noise_profiles import NoiseProfileStore, noise_threshold
+
+SR = 16000
+
+
+def synthetic_recording(path, minutes, seed=0):
+    """Tone bursts standing in for speech over steady hiss, written as 16-bit PCM."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(minutes * 60 * SR)) / SR
+    speech = 0.3 * np.sin(2 * np.pi * 300 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0.3)
+    audio = speech + 0.05 * rng.standard_normal(len(t))
+    wavfile.write(path, SR, (np.clip(audio, -1, 1) * 32767).astype(np.int16))
+
+
+def noise_setup(path, store, repeats=20):
+    """Mean seconds to get a gating threshold: estimated from the recording vs from the store."""
+    rate, data = cleaning._open_wav(path)
+
+    def estimate():
+        audio = cleaning._to_mono_float(data[:30 * rate])
+        return cleaning.estimate_noise_clip(audio, rate)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        noise_threshold(estimate())
+    estimated_s = (time.perf_counter() - start) / repeats
+
+    store.resolve("setup-room", rate, estimate)  # learn it once
+    start = time.perf_counter()
+    for _ in range(repeats):
+        store.resolve("setup-room", rate, estimate)
+    cached_s = (time.perf_counter() - start) / repeats
+    return estimated_s, cached_s
+
+
+def timed_run(path, noise_profile, block_seconds):
+    report = {}
+    start = time.perf_counter()
+    samples = sum(len(b) for b in cleaning.iter_cleaned_blocks(
+        path, block_seconds=block_seconds, noise_profile=noise_profile, report=report))
+    return report.get("noise_profile_status"), time.perf_counter() - start, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--block-seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "raw.wav")
+        synthetic_recording(path, args.minutes)
+        store_dir = os.path.join(tmp, "noise_profiles")
+        cleaning.NoiseProfileStore = lambda: NoiseProfileStore(directory=store_dir)
+
+        estimated_s, cached_s = noise_setup(path, cleaning.NoiseProfileStore())
+        print(f"noise set-up: estimated {estimated_s * 1000:.1f} ms, "
+              f"cached profile {cached_s * 1000:.1f} ms")
+
+        print(f"{args.minutes:g} min at {SR} Hz, {args.block_seconds:g}s blocks")
+        for label, profile in (("no profile", None), ("first run", "bench-room"), ("cached", "bench-room")):
+            status, total_s, samples = timed_run(path, profile, args.block_seconds)
+            print(f"  {label:<11} ({status or '-':>7}): {total_s:6.2f}s "
+                  f"({samples / SR / total_s:5.0f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,74 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 if not GEMINI_API_KEY:
     print("Warning: GEMINI_API_KEY is not set in environment or .env file.")
+
+# Whisper model server (agents/whisper_server.py)
+WHISPER_SERVER_HOST = os.getenv("WHISPER_SERVER_HOST", "127.0.0.1")
+WHISPER_SERVER_PORT = int(os.getenv("WHISPER_SERVER_PORT", "6001"))
+# Shared secret for the server socket. When unset, the server generates a random key on its
+# first start and keeps it in WHISPER_SERVER_AUTHKEY_FILE (mode 0600), where local clients read it.
+WHISPER_SERVER_AUTHKEY = os.getenv("WHISPER_SERVER_AUTHKEY", "")
+WHISPER_SERVER_AUTHKEY_FILE = os.getenv(
+    "WHISPER_SERVER_AUTHKEY_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "whisper_server.key"),
+)
+
+# Cached noise profiles per consult room / microphone (agents/noise_profiles.py)
+NOISE_PROFILE_DIR = os.getenv(
+    "NOISE_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "noise_profiles"),
+)
+NOISE_PROFILE_MAX_AGE_DAYS = float(os.getenv("NOISE_PROFILE_MAX_AGE_DAYS", "7"))
+NOISE_PROFILE_DRIFT_DB = float(os.getenv("NOISE_PROFILE_DRIFT_DB", "6"))
+# A cached profile is compared against the noise of a new recording at most this often
+NOISE_PROFILE_CHECK_HOURS = float(os.getenv("NOISE_PROFILE_CHECK_HOURS", "24"))
+
+# SNR gate for noise reduction (agents/audio_cleaning_agent.py)
+# Recordings at or above SNR_SKIP_DB skip denoising; between SNR_LIGHT_DB and SNR_SKIP_DB
+# they get a lighter pass.
+SNR_SKIP_DB = float(os.getenv("SNR_SKIP_DB", "30"))
+SNR_LIGHT_DB = float(os.getenv("SNR_LIGHT_DB", "20"))
+
+# On-disk cache for Gemini responses (agents/gemini_cache.py)
+GEMINI_CACHE_PATH = os.getenv(
+    "GEMINI_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "gemini_cache.sqlite3"),
+)
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "5000"))
+GEMINI_CACHE_TTL_HOURS = float(os.getenv("GEMINI_CACHE_TTL_HOURS", "168"))
+
+# Shared Gemini access layer (agents/gemini_gateway.py)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "3"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+# Tail-latency controls: per-call deadline, hedging and circuit breaker
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "60"))
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "60"))
+
+# Entity directory for name protection (agents/entity_index.py)
+# JSON, JSONL, CSV or TSV of staff, patient and hospital names; only the entries that
+# plausibly occur in a transcript are added to the correction prompt.
+ENTITY_DIRECTORY = os.getenv("ENTITY_DIRECTORY", "")
+ENTITY_MATCH_THRESHOLD = float(os.getenv("ENTITY_MATCH_THRESHOLD", "80"))
+ENTITY_MAX_INJECTED = int(os.getenv("ENTITY_MAX_INJECTED", "20"))
+
+# Clinical terminology for the medical extractor (agents/terminology.py)
+# CSV, TSV or JSONL with code, term, synonyms and category columns. The compiled matcher
+# is cached under TERMINOLOGY_CACHE_DIR and rebuilt only when the file changes.
+TERMINOLOGY_PATH = os.getenv("TERMINOLOGY_PATH", "")
+TERMINOLOGY_CACHE_DIR = os.getenv(
+    "TERMINOLOGY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "terminology"),
+)
+
+# Medicine formulary for name resolution (agents/formulary.py)
+# TXT, CSV, TSV or JSONL of brand and generic names; misheard names are resolved to the
+# closest entry scoring at least FORMULARY_MATCH_THRESHOLD.
+FORMULARY_PATH = os.getenv("FORMULARY_PATH", "")
+FORMULARY_MATCH_THRESHOLD = float(os.getenv("FORMULARY_MATCH_THRESHOLD", "85"))
+# Single words from a sentence must match more closely than names or word pairs, so ordinary
+# words near a dose are not mistaken for medicines
+FORMULARY_SINGLE_WORD_THRESHOLD = float(os.getenv("FORMULARY_SINGLE_WORD_THRESHOLD", "90"))
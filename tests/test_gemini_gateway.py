@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.gemini_gateway import (
+    GeminiGateway,
+    CircuitBreaker,
+    TokenBucket,
+    DeadlineExceeded,
+    CircuitOpenError,
+)
+
+
+class FakeModels:
+    """Stands in for client.models; answers after `delay` seconds."""
+
+    def __init__(self, delay=0.0, stream_delays=(), stream_error=None):
+        self.delay = delay
+        self.stream_delays = stream_delays
+        self.stream_error = stream_error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return SimpleNamespace(text="ok")
+
+    def generate_content_stream(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.stream_error is not None:
+            raise self.stream_error
+        for delay in self.stream_delays:
+            time.sleep(delay)
+            yield SimpleNamespace(text="chunk")
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+def make_gateway(models, rate, capacity, failures=2):
+    gateway = GeminiGateway(api_key="test-key", max_concurrency=2, deadline=0.2)
+    gateway.client = SimpleNamespace(models=models)
+    gateway.bucket = TokenBucket(rate, capacity)
+    gateway.breaker = CircuitBreaker(failure_threshold=failures, reset_seconds=60)
+    return gateway
+
+
+class CircuitBreakerDeadlineTest(unittest.TestCase):
+    def test_rate_limited_calls_do_not_open_breaker(self):
+        models = FakeModels()
+        # One token, then a new one only every 20s: later calls expire waiting locally
+        gateway = make_gateway(models, rate=0.05, capacity=1)
+        self.assertEqual(gateway.generate("hi", model="m").text, "ok")
+
+        for _ in range(4):
+            with self.assertRaises(DeadlineExceeded):
+                gateway.generate("hi", model="m", hedge=False)
+
+        self.assertEqual(gateway.breaker.state, "closed")
+        self.assertEqual(gateway.metrics()["deadline_exceeded"], 4)
+        self.assertEqual(models.calls, 1)
+
+    def test_cancelled_queued_calls_do_not_open_breaker(self):
+        gateway = make_gateway(FakeModels(), rate=0.05, capacity=1)
+        gateway.generate("hi", model="m")
+
+        futures = [gateway.submit("hi", model="m") for _ in range(3)]
+        gateway.cancel(*futures, deadline_exceeded=True)
+
+        self.assertEqual(gateway.breaker.state, "closed")
+        self.assertEqual(gateway.metrics()["deadline_exceeded"], 1)
+
+    def test_cancelling_many_calls_is_one_failure(self):
+        gateway = make_gateway(FakeModels(delay=1.0), rate=100, capacity=10)
+
+        futures = [gateway.submit("hi", model="m") for _ in range(6)]
+        time.sleep(0.1)  # two are running on the API, the rest are queued
+        gateway.cancel(*futures, deadline_exceeded=True)
+
+        self.assertEqual(gateway.breaker.state, "closed")
+        self.assertEqual(gateway.breaker._failures, 1)
+
+    def test_slow_api_opens_breaker(self):
+        gateway = make_gateway(FakeModels(delay=1.0), rate=100, capacity=10)
+
+        for _ in range(2):
+            with self.assertRaises(DeadlineExceeded):
+                gateway.generate("hi", model="m", hedge=False)
+
+        self.assertEqual(gateway.breaker.state, "open")
+
+
+
+class StreamDeadlineTest(unittest.TestCase):
+    def test_stalled_first_chunk_hits_deadline(self):
+        gateway = make_gateway(FakeModels(stream_delays=[5.0]), rate=100, capacity=10)
+
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            list(gateway.stream("hi", model="m"))
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_total_time_is_bounded(self):
+        gateway = make_gateway(FakeModels(stream_delays=[0.05] * 40), rate=100, capacity=10)
+
+        received = []
+        with self.assertRaises(DeadlineExceeded):
+            for chunk in gateway.stream("hi", model="m"):
+                received.append(chunk)
+        self.assertTrue(received)
+
+    def test_retry_backoff_beyond_deadline_gives_up(self):
+        gateway = make_gateway(FakeModels(stream_error=QuotaError("429 RESOURCE_EXHAUSTED")),
+                               rate=100, capacity=10)
+        gateway.base_delay = gateway.max_delay = 30.0
+
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            list(gateway.stream("hi", model="m"))
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_open_circuit_fails_before_streaming(self):
+        gateway = make_gateway(FakeModels(stream_delays=[0.0]), rate=100, capacity=10)
+        for _ in range(2):
+            gateway.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            gateway.stream("hi", model="m")
+
+
+if __name__ == "__main__":
+    unittest.main()